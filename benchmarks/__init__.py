@@ -0,0 +1,9 @@
+# coding: utf-8
+"""Performance benchmarks for the yadic container.
+
+Run from the project root, e.g.:
+
+    PYTHONPATH=src python -m benchmarks -o results.json
+    PYTHONPATH=src python -m benchmarks --compare results.json deep wide
+    PYTHONPATH=src python -m benchmarks.threads
+"""
@@ -0,0 +1,39 @@
+# coding: utf-8
+"""Runs the benchmark suite (see benchmarks.suite)"""
+
+from __future__ import print_function
+
+from optparse import OptionParser
+
+from benchmarks import suite
+
+
+def _main():
+    parser = OptionParser(usage='usage: %prog [options] [CASE...]')
+    parser.add_option(
+        '-o', '--output', dest='output', metavar='FILE', default=None,
+        help='file for the results (JSON)')
+    parser.add_option(
+        '-c', '--compare', dest='compare', metavar='FILE', default=None,
+        help='results of the previous run to compare with')
+    parser.add_option(
+        '-t', '--min-time', dest='min_time', type='float', default=0.2,
+        help='minimal time of the measurement of each metric')
+    options, cases = parser.parse_args()
+
+    unknown = set(cases) - set(suite.GENERATORS)
+    if unknown:
+        parser.error('unknown cases: {}'.format(', '.join(sorted(unknown))))
+
+    data = suite.run(cases, options.min_time)
+    if options.output:
+        suite.save(data, options.output)
+    if options.compare:
+        lines = suite.compare(suite.load(options.compare), data)
+    else:
+        lines = suite.format_results(data)
+    print('\n'.join(lines))
+
+
+if __name__ == '__main__':
+    _main()
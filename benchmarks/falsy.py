@@ -0,0 +1,73 @@
+# coding: utf-8
+"""Regression benchmark: falsy singletons and realizations
+must be built/imported only once"""
+
+from __future__ import print_function
+
+import time
+from optparse import OptionParser
+
+from yadic.container import Container
+
+
+class EmptyPool(object):
+    """Pool, which is empty (falsy) while nobody uses it"""
+
+    def __len__(self):
+        return 0
+
+
+def run(gets=100000):
+    """Runs the benchmark and returns its stats"""
+    counts = {'imports': 0, 'constructions': 0}
+
+    def registry():
+        counts['constructions'] += 1
+        return {}
+
+    def pool():
+        counts['constructions'] += 1
+        return EmptyPool()
+
+    entities = {'Registry': registry, 'Pool': pool, 'ZERO': 0}
+
+    def get_entity(name):
+        counts['imports'] += 1
+        return entities[name]
+
+    cont = type('BenchContainer', (Container,), {
+        '_get_entity': staticmethod(get_entity)
+    })({
+        'registry': {
+            '__default__': {'__type__': 'singleton'},
+            'plugins': {'__realization__': 'Registry'},
+            'pool': {'__realization__': 'Pool'},
+        },
+        'const': {
+            'zero': {'__realization__': 'ZERO', '__type__': 'static'}
+        }
+    })
+
+    keys = [('registry', 'plugins'), ('registry', 'pool'), ('const', 'zero')]
+    start = time.time()
+    for i in range(gets):
+        cont.get(*keys[i % len(keys)])
+    counts['gets'] = gets
+    counts['seconds'] = time.time() - start
+    return counts
+
+
+def _main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-n', '--gets', type='int', default=100000)
+    options, _ = parser.parse_args()
+
+    stats = run(options.gets)
+    for key in sorted(stats):
+        print('{}: {}'.format(key, stats[key]))
+    if stats['constructions'] != 2 or stats['imports'] != 3:
+        raise SystemExit('falsy values were rebuilt!')
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,81 @@
+# coding: utf-8
+"""Benchmark: iterative resolver vs. the recursive one
+on the deep and the wide synthetic graphs"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+from optparse import OptionParser
+
+from yadic.container import EntityConfiguringError
+
+from benchmarks.synthetic import BenchContainer, deep, wide
+
+
+class RecursiveContainer(BenchContainer):
+    """Container with the former recursive resolver"""
+
+    def _resolve(self, plan):
+        deps = plan.kwargs.copy()
+        for dep_name, first, rest in plan.deps:
+            try:
+                if first is None:
+                    deps[dep_name] = tuple(self.get(g, e) for (g, e) in rest)
+                else:
+                    deps[dep_name] = self.get(first, rest)
+            except EntityConfiguringError as e:
+                e.path = (plan.fullname,) + e.path
+                raise
+        try:
+            result = plan.realization(**deps)
+        except Exception as e:
+            raise EntityConfiguringError(path=(plan.fullname,), exc=e)
+        if plan.type == 'singleton':
+            self._singletones[plan.key] = result
+        return result
+
+
+def measure(cls, config, key, number):
+    """Returns seconds per "get" or None if the recursion limit is hit"""
+    cont = cls(config)
+    try:
+        cont.get(*key)
+    except RuntimeError:  # RecursionError
+        return None
+    return timeit.timeit(lambda: cont.get(*key), number=number) / number
+
+
+def run(depth=200, width=1000, number=200):
+    """Runs the benchmark and returns its stats"""
+    cases = [
+        ('deep',) + deep(depth),
+        ('deep-x10',) + deep(depth * 10),
+        ('wide',) + wide(width),
+    ]
+    return dict(
+        ('{}/{}'.format(case, cls.__name__),
+         measure(cls, config, key, number))
+        for case, config, key in cases
+        for cls in (BenchContainer, RecursiveContainer)
+    )
+
+
+def _main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-d', '--depth', type='int', default=200)
+    parser.add_option('-w', '--width', type='int', default=1000)
+    parser.add_option('-n', '--number', type='int', default=200)
+    options, _ = parser.parse_args()
+
+    print('recursion limit: {}'.format(sys.getrecursionlimit()))
+    stats = run(options.depth, options.width, options.number)
+    for key in sorted(stats):
+        val = stats[key]
+        print('{}: {}'.format(
+            key, 'recursion limit!' if val is None else
+            '{:.1f} us/get'.format(val * 1e6)))
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,124 @@
+# coding: utf-8
+"""Benchmark suite for the container hot paths.
+
+Results are saved as JSON, so the runs (e.g. of different versions)
+can be compared:
+
+    PYTHONPATH=src python -m benchmarks -o new.json --compare old.json
+"""
+
+from __future__ import print_function
+
+import json
+import platform
+import timeit
+
+from yadic import dot
+
+from benchmarks.synthetic import BenchContainer, GENERATORS
+
+
+def _timeit(fn, min_time):
+    """Returns the seconds per call of fn"""
+    number = 1
+    while True:
+        seconds = timeit.timeit(fn, number=number)
+        if seconds >= min_time:
+            return seconds / number
+        number *= 10
+
+
+def _with_type(config, key, typ):
+    """Returns the copy of config with the type of the root changed"""
+    config = dict(config)
+    config[key[0]] = dict(config[key[0]])
+    blueprint = config[key[0]][key[1]] = dict(config[key[0]][key[1]])
+    blueprint['__type__'] = typ
+    return config
+
+
+def bench_case(config, key, min_time=0.2):
+    """Returns the metrics {name: seconds per op} for the config"""
+    group = key[0]
+
+    def init_cold():
+        # memo of the normalized configs is dropped
+        BenchContainer._prepared.clear()
+        BenchContainer(config)
+
+    def get_cold():
+        cont = BenchContainer(config)
+        cont.get(*key)
+
+    warm = BenchContainer(config)
+    warm.get(*key)
+    singleton = BenchContainer(_with_type(config, key, 'singleton'))
+    singleton.get(*key)
+    static = BenchContainer(dict(config, bench_static={'s': {
+        '__realization__': 'bench.CONST', '__type__': 'static'}}))
+
+    result = {
+        'init_cold': _timeit(init_cold, min_time),
+        'init_memoized': _timeit(lambda: BenchContainer(config), min_time),
+        'get_cold': _timeit(get_cold, min_time),
+        'get_transient': _timeit(lambda: warm.get(*key), min_time),
+        'get_singleton': _timeit(lambda: singleton.get(*key), min_time),
+        'get_static': _timeit(
+            lambda: static.get('bench_static', 's'), min_time),
+        'itergroup': _timeit(
+            lambda: list(warm.itergroup(group)), min_time),
+        'dot': _timeit(lambda: dot.dot(warm, {}, {}), min_time),
+    }
+    BenchContainer._prepared.clear()
+    return result
+
+
+def run(cases=None, min_time=0.2):
+    """Runs the suite and returns the results
+    :param cases: names of the generators (all by default)
+    :param min_time: minimal time of the measurement of each metric"""
+    results = {}
+    for name in sorted(cases or GENERATORS):
+        config, key = GENERATORS[name]()
+        results[name] = bench_case(config, key, min_time)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'results': results,
+    }
+
+
+def compare(old, new):
+    """Returns the lines of the comparison table (new/old ratios)"""
+    lines = ['{:<32} {:>12} {:>12} {:>7}'.format(
+        'case/metric', 'old, us', 'new, us', 'ratio')]
+    for case in sorted(new['results']):
+        for metric, seconds in sorted(new['results'][case].items()):
+            try:
+                base = old['results'][case][metric]
+            except KeyError:
+                continue
+            lines.append('{:<32} {:>12.2f} {:>12.2f} {:>7.2f}'.format(
+                '{}/{}'.format(case, metric),
+                base * 1e6, seconds * 1e6, seconds / base))
+    return lines
+
+
+def format_results(data):
+    """Returns the lines of the results table"""
+    return [
+        '{:<32} {:>12.2f} us'.format(
+            '{}/{}'.format(case, metric), seconds * 1e6)
+        for case in sorted(data['results'])
+        for metric, seconds in sorted(data['results'][case].items())
+    ]
+
+
+def save(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,99 @@
+# coding: utf-8
+"""Generators of the synthetic configurations.
+Each generator returns the pair (config, root key)"""
+
+from yadic.container import Container
+
+
+class BenchContainer(Container):
+    """Container with the fake realizations: "bench.CONST" is a static
+    value, any other one builds the dict of its kwargs"""
+
+    @staticmethod
+    def _get_entity(name):
+        if name == 'bench.CONST':
+            return 42
+        return lambda **deps: deps
+
+
+def _node(**deps):
+    result = {'__realization__': 'bench.node'}
+    result.update(deps)
+    return result
+
+
+def wide(width=1000):
+    """Root entity with "width" leaf deps"""
+    leaves = dict(
+        ('leaf{}'.format(i), _node(**{'$x': i})) for i in range(width))
+    return {
+        'root': {'r': _node(**{'leaves:leaf': sorted(leaves)})},
+        'leaf': leaves,
+    }, ('root', 'r')
+
+
+def deep(depth=200):
+    """Chain of "depth" entities"""
+    ents = dict(
+        ('n{}'.format(i), _node(**{'nxt:node': 'n{}'.format(i + 1)}))
+        for i in range(depth)
+    )
+    ents['n{}'.format(depth)] = _node()
+    return {'node': ents}, ('node', 'n0')
+
+
+def diamond(layers=6, width=3):
+    """Layers of entities, each depends on all the entities
+    of the next layer (so the lower ones are reached many times)"""
+    config = {}
+    for i in range(layers):
+        nxt = ['e{}'.format(j) for j in range(width)]
+        config['layer{}'.format(i)] = dict(
+            ('e{}'.format(j),
+             _node(**({'deps:layer{}'.format(i + 1): nxt}
+                      if i + 1 < layers else {})))
+            for j in range(width)
+        )
+    return config, ('layer0', 'e0')
+
+
+def defaults(groups=50, entities=20):
+    """Groups with the "__default__" sections,
+    merged into each of the entities"""
+    config = {
+        'const': {'c': {'__realization__': 'bench.CONST',
+                        '__type__': 'static'}},
+        'shared': {'s': _node(__type__='singleton')},
+    }
+    for g in range(groups):
+        section = config['group{}'.format(g)] = {
+            '__default__': _node(**{
+                '$a': 1, '$b': 'b', '$c': {'x': 1},
+                'c:const': 'c', 's:shared': 's',
+            })
+        }
+        for e in range(entities):
+            section['e{}'.format(e)] = {'$a': e, '$d': [e]}
+    return config, ('group0', 'e0')
+
+
+def list_deps(entities=100, size=50):
+    """Entities with the large list-form deps"""
+    items = dict(('i{}'.format(i), _node()) for i in range(size))
+    config = {
+        'item': items,
+        'holder': dict(
+            ('h{}'.format(e), _node(**{'items:item': sorted(items)}))
+            for e in range(entities)
+        ),
+    }
+    return config, ('holder', 'h0')
+
+
+GENERATORS = {
+    'wide': wide,
+    'deep': deep,
+    'diamond': diamond,
+    'defaults': defaults,
+    'list_deps': list_deps,
+}
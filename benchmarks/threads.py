@@ -0,0 +1,79 @@
+# coding: utf-8
+"""Stress benchmark: many threads hammering "get" on cold singletons"""
+
+from __future__ import print_function
+
+import threading
+import time
+from optparse import OptionParser
+
+from yadic.container import Container
+
+
+def make_container(singletons, delay, counter):
+    """Returns the container with the slow singletons,
+    that count their constructions"""
+
+    def slow():
+        counter.append(1)
+        time.sleep(delay)
+        return object()
+
+    return type('BenchContainer', (Container,), {
+        '_get_entity': staticmethod(lambda name: slow)
+    })({
+        'pool': dict(
+            ('p{}'.format(i), {
+                '__realization__': 'bench.slow',
+                '__type__': 'singleton'
+            })
+            for i in range(singletons)
+        )
+    })
+
+
+def run(threads=32, singletons=16, rounds=1000, delay=0.01):
+    """Runs the benchmark and returns its stats"""
+    counter = []
+    cont = make_container(singletons, delay, counter)
+    names = sorted(cont._config['pool'])
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for i in range(rounds):
+            cont.get('pool', names[i % singletons])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return {
+        'threads': threads,
+        'singletons': singletons,
+        'gets': threads * rounds,
+        'constructions': len(counter),
+        'seconds': time.time() - start,
+    }
+
+
+def _main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-t', '--threads', type='int', default=32)
+    parser.add_option('-s', '--singletons', type='int', default=16)
+    parser.add_option('-r', '--rounds', type='int', default=1000)
+    parser.add_option('-d', '--delay', type='float', default=0.01)
+    options, _ = parser.parse_args()
+
+    stats = run(options.threads, options.singletons,
+                options.rounds, options.delay)
+    for key in sorted(stats):
+        print('{}: {}'.format(key, stats[key]))
+    if stats['constructions'] != options.singletons:
+        raise SystemExit('singletons were built more than once!')
+
+
+if __name__ == '__main__':
+    _main()
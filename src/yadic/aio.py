@@ -0,0 +1,244 @@
+# coding: utf-8
+"""Asynchronous resolution of the entities (requires Python 3.5+)"""
+
+import asyncio
+import inspect
+import threading
+
+from yadic.container import EntityConfiguringError, _MISSING
+from yadic.lazy import LazyProxy
+from yadic.scope import timeout_error
+from yadic.util import default_workers
+
+
+async def resolve(container, group, name):
+    """Returns the fully configured entity instance.
+    Coroutine realizations are awaited, sibling deps are
+    resolved concurrently
+    :param container: container
+    :type container: yadic.container.Container
+    :param group: entity group
+    :type group: str
+    :param name: entity name
+    :type name: str
+    """
+    plan = _get_plan(container, (group, name))
+    # "context" deps are built in the caller's context beforehand,
+    # because the instances, built by the concurrent child tasks,
+    # would stay in the copied contexts of those tasks
+    for key in _context_deps(container, plan):
+        await _resolve(container, _get_plan(container, key))
+    return await _resolve(container, plan)
+
+
+def _get_plan(container, key):
+    return container._plans.get(key) or container._get_plan(*key)
+
+
+def _context_deps(container, plan):
+    """Returns the keys of the "context" entities, which the entity
+    (eagerly) depends on, in dependency order (memoized)"""
+    memo_key = ('context', plan.key)
+    try:
+        return container._closures[memo_key]
+    except KeyError:
+        pass
+    seen = set()
+    result = []
+    keys = list(plan.keys)
+    while keys:
+        key = keys.pop()
+        if key in seen:
+            continue
+        seen.add(key)
+        dep = _get_plan(container, key)
+        if dep.type == 'context':
+            result.append(key)
+        keys.extend(dep.keys)
+    result.sort(key=container._get_depth)
+    return container._closures.setdefault(memo_key, tuple(result))
+
+
+async def _resolve(container, plan):
+    typ = plan.type
+
+    if typ == 'static':
+        return plan.realization
+
+    if typ == 'singleton':
+        result = container._singletones.get(plan.key, _MISSING)
+        if result is not _MISSING:
+            return result
+        return await _shared(
+            container, plan.key, container._singletones, plan)
+
+    cache = container._get_cache(plan)
+    if cache is None:
+        return await _build(container, plan)
+    result = cache.get(plan.key, _MISSING)
+    if result is not _MISSING:
+        return result
+    if typ == 'context':
+        # the current task is the caller one (see resolve)
+        result = cache[plan.key] = await _build(container, plan)
+        return result
+    # "scoped" and "thread" ones
+    return await _shared(container, (plan.key, id(cache)), cache, plan)
+
+
+async def _shared(container, pending_key, cache, plan):
+    """Returns the instance of the entity for the cache: concurrent
+    tasks share the single in-flight construction"""
+    task = container._pending.get(pending_key)
+    if task is None:
+        task = container._pending[pending_key] = asyncio.ensure_future(
+            _build_cached(container, plan, cache, pending_key))
+    try:
+        return await asyncio.shield(task)
+    except EntityConfiguringError as e:
+        # each waiter extends the path of its own copy of error
+        raise EntityConfiguringError(path=e.path, exc=e.exc)
+
+
+async def _build_cached(container, plan, cache, pending_key):
+    try:
+        result = await _build(container, plan)
+        # the sync "get" could build the instance meanwhile
+        existing = cache.get(plan.key, _MISSING)
+        if existing is not _MISSING:
+            return existing
+        cache[plan.key] = result
+        return result
+    finally:
+        del container._pending[pending_key]
+
+
+def _in_thread(fn, *args):
+    """Returns the future of the fn(*args), called in the new daemon
+    thread (like the sync disposal, see yadic.scope.dispose_parallel),
+    so the event loop isn't blocked and the hung call doesn't block
+    the interpreter exit"""
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if not future.done():
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def run():
+        try:
+            result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:  # loop is closed, nobody waits
+            pass
+
+    thread = threading.Thread(target=run, name='yadic-dispose')
+    thread.daemon = True
+    thread.start()
+    return future
+
+
+async def dispose(instance):
+    """Disposes the instance, if it is disposable: awaits its
+    "close" (or calls the sync one) or exits it as a context manager
+    (the asynchronous one preferably). Sync methods are called in
+    the separate threads
+    :param instance: instance of the entity"""
+    close = getattr(instance, 'close', None)
+    if callable(close):
+        if inspect.iscoroutinefunction(close):
+            await close()
+            return
+        result = await _in_thread(close)
+        if inspect.isawaitable(result):
+            await result
+        return
+    aexit = getattr(instance, '__aexit__', None)
+    if callable(aexit):
+        await aexit(None, None, None)
+        return
+    exit_ = getattr(instance, '__exit__', None)
+    if callable(exit_):
+        await _in_thread(exit_, None, None, None)
+
+
+async def close(container, timeout=None):
+    """Disposes the built singletones of the container in reverse
+    dependency order (see yadic.container.Container.close),
+    the independent ones are disposed concurrently (but no more than
+    default_workers at once)
+    :param container: container
+    :type container: yadic.container.Container
+    :param timeout: time (in seconds) to wait for each instance
+    :type timeout: float
+    """
+    pools, levels = container._take_disposables()
+    errors = []
+    for pool in pools:
+        try:
+            await _in_thread(pool.close)
+        except Exception as e:
+            errors.append(e)
+    # the timeout is counted from the start of the disposal, so the slot
+    # of the hung one is released, when it times out
+    semaphore = asyncio.Semaphore(default_workers())
+
+    async def dispose_one(instance):
+        async with semaphore:
+            await asyncio.wait_for(dispose(instance), timeout)
+
+    for instances in levels:
+        keys = sorted(instances)
+        results = await asyncio.gather(*[
+            dispose_one(instances[key]) for key in keys
+        ], return_exceptions=True)
+        for key, result in zip(keys, results):
+            if isinstance(result, asyncio.TimeoutError):
+                errors.append(timeout_error(key, timeout))
+            elif isinstance(result, Exception):
+                errors.append(result)
+    if errors:
+        raise errors[0]
+
+
+async def _build(container, plan):
+    """Builds the new instance of the entity using its plan"""
+    # all the deps (including the list-form ones) are gathered at once
+    keys = []
+    for _, first, rest in plan.deps:
+        keys.extend(rest if first is None else ((first, rest),))
+    try:
+        if len(keys) > 1:
+            values = await asyncio.gather(*[
+                _resolve(container, _get_plan(container, key))
+                for key in keys])
+        else:
+            values = [
+                await _resolve(container, _get_plan(container, key))
+                for key in keys]
+    except EntityConfiguringError as e:
+        e.path = (plan.fullname,) + e.path
+        raise
+
+    deps = plan.kwargs.copy()
+    for dep_name, factory in plan.lazy:
+        deps[dep_name] = LazyProxy(factory)
+    values = iter(values)
+    for dep_name, first, rest in plan.deps:
+        if first is None:
+            deps[dep_name] = tuple(next(values) for _ in rest)
+        else:
+            deps[dep_name] = next(values)
+    try:
+        result = plan.realization(**deps)
+        if inspect.isawaitable(result):
+            result = await result
+    except Exception as e:
+        raise EntityConfiguringError(path=(plan.fullname,), exc=e)
+    return result
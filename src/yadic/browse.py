@@ -44,18 +44,9 @@ def main():
         data = {}
         for grp, ents in cont._config.items():
             grp_data = data[grp] = {}
-            for name, blueprint in ents.items():
-                deps = grp_data[name] = []
-                for dep_name, dep_value in blueprint.items():
-                    if (
-                        dep_name.startswith('$') or
-                        dep_name.startswith('_')
-                    ):
-                        continue
-                    if dep_value[0] is None:
-                        deps.extend(dep_value[1])
-                    else:
-                        deps.append(dep_value)
+            for name in ents:
+                grp_data[name] = sorted(
+                    cont.dependencies(grp, name, transitive=False))
         build_and_browse({
             'title': fname,
             'data': json.dumps(data)
@@ -1,10 +1,183 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
+from contextlib import contextmanager
+from copy import copy
+from functools import partial
 from importlib import import_module
+import keyword
+import mmap
+import pickle
 import re
+import sys
+import threading
+import time
 
-from yadic.util import merge
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without the "futures" backport
+    ThreadPoolExecutor = None
+
+from yadic import graph
+from yadic.lazy import LazyProxy, provider
+from yadic.pool import Pool
+from yadic.scope import ContextCache, Local, Scope, dispose_parallel
+from yadic.util import default_workers, freeze, merge
+
+
+# marks the absent cache entries (cached values can be falsy)
+_MISSING = object()
+
+
+# imports of the different modules don't block each other
+# (per-module import locks)
+_PARALLEL_IMPORTS = sys.version_info >= (3, 3)
+
+
+def _parallel_map(fn, items, max_workers=None):
+    """Returns the list of fn(item) for each of items, calls are made
+    in parallel threads (if concurrent.futures is available).
+    Number of threads is bounded by max_workers (see default_workers)"""
+    if ThreadPoolExecutor is None or len(items) < 2:
+        return [fn(i) for i in items]
+    workers = min(len(items), max_workers or default_workers())
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(fn, items))
+
+
+try:
+    _STRING_TYPES = (basestring,)
+except NameError:  # Python 3
+    _STRING_TYPES = (str,)
+
+_is_ident = re.compile(r'(?i)^[a-z]\w*$').match
+_is_valid_attr = re.compile(
+    r'(?i)^(?:\$?[a-z]\w*|[a-z]\w*:[a-z]\w*)$').match
+
+
+# snapshot format: header and pickled (config, graph, levels)
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = 'YADIC-SNAPSHOT:{}\n'.format(_SNAPSHOT_VERSION).encode()
+
+
+def _is_mutable(value):
+    """Checks, if the (freezable) value is or contains the list/dict"""
+    if isinstance(value, (dict, list)):
+        return True
+    if isinstance(value, tuple):
+        return any(_is_mutable(v) for v in value)
+    return False
+
+
+def _mutable_statics(normalized):
+    """Returns the paths (group, entity, "$name") of the mutable
+    "$static" values of the normalized configuration"""
+    return tuple(
+        (grp, ent, k)
+        for grp, ents in normalized.items()
+        for ent, blueprint in ents.items()
+        for k, v in blueprint.items()
+        if k.startswith('$') and _is_mutable(v)
+    )
+
+
+def _rebind_statics(normalized, paths, config):
+    """Returns the copy of the normalized configuration with the
+    mutable "$static" values, taken from the initial configuration.
+    Only the blueprints with such values are copied
+    :param normalized: normalized configuration
+    :param paths: see _mutable_statics
+    :param config: initial configuration (equal to the normalized one)"""
+    result = dict(normalized)
+    for grp, ent, k in paths:
+        if result[grp] is normalized[grp]:
+            result[grp] = dict(normalized[grp])
+        section = result[grp]
+        if section[ent] is normalized[grp][ent]:
+            section[ent] = dict(section[ent])
+        raw = config[grp]
+        section[ent][k] = raw.get(ent, {}).get(
+            k, raw.get('__default__', {}).get(k))
+    return result
+
+
+class _TooManyErrors(Exception):
+    """Stops the config validation"""
+
+
+# lifetimes, ordered by their length: the entity can't hold the one
+# of the shorter lifetime (transient entities pass the instances through)
+_LIFETIME_RANKS = {
+    'singleton': 3, 'pooled': 3, 'thread': 2, 'context': 2, 'scoped': 1}
+
+
+def _captive_deps(config):
+    """Returns the list of errors for the entities, which outlive
+    the ones they hold (directly or via transient deps, providers
+    are fine, because they get the dep on each call)
+    :param config: normalized configuration
+    :type config: dict"""
+    holds = {}
+    for grp, ents in config.items():
+        for ent, blueprint in ents.items():
+            providers = blueprint.get('__providers__', ())
+            holds[(grp, ent)] = graph.dependencies(dict(
+                (k, v) for k, v in blueprint.items()
+                if k.lstrip('~') not in providers))
+    dependents = graph.reverse(holds)
+
+    def lifetime(node):
+        return config[node[0]][node[1]].get('__type__')
+
+    errors = []
+    for held in holds:
+        rank = _LIFETIME_RANKS.get(lifetime(held))
+        if rank is None:
+            continue
+        seen = set()
+        nodes = [held]
+        while nodes:
+            for node in dependents.get(nodes.pop(), ()):
+                if node in seen:
+                    continue
+                seen.add(node)
+                typ = lifetime(node)
+                if typ is None:
+                    nodes.append(node)
+                elif _LIFETIME_RANKS.get(typ, 0) > rank:
+                    errors.append(
+                        '{0!r} ({1}) outlives the {2} {3!r}!'.format(
+                            '{}:{}'.format(*node), typ, lifetime(held),
+                            '{}:{}'.format(*held)))
+    return errors
+
+
+def _sort_graph(deps, config):
+    """Returns the topological order (levels) of the dependency graph.
+    Raises ValueError for the unknown deps, for the cycles, for the deps
+    on the pooled entities and for the longer-living entities, holding
+    the shorter-living ones"""
+    errors = [
+        '{0!r} depends on unknown {1!r}!'.format(
+            '{}:{}'.format(*node), '{}:{}'.format(*dep))
+        for node, dep in graph.unknown(deps)
+    ]
+    try:
+        # each level depends on the previous ones
+        levels = graph.levels(deps)
+    except ValueError as e:
+        errors.append(str(e))
+    if not errors:
+        errors = [
+            '{0!r} depends on the pooled {1!r} (use the acquire)!'.format(
+                '{}:{}'.format(*node), '{}:{}'.format(*dep))
+            for node, node_deps in deps.items()
+            for dep in node_deps
+            if config[dep[0]][dep[1]].get('__type__') == 'pooled'
+        ] + _captive_deps(config)
+    if errors:
+        raise ValueError('\n'.join(['Config errors:'] + sorted(errors)))
+    return levels
 
 
 def _merge_upto_lvl2_then_take_other(d1, d2, resolver, path):
@@ -30,6 +203,78 @@ class EntityConfiguringError(TypeError):
         )
 
 
+class _Plan(object):
+    """Precompiled resolution plan of the entity"""
+
+    __slots__ = (
+        'key', 'fullname', 'type', 'realization', 'kwargs', 'deps',
+        'keys', 'slots', 'lazy', 'bound'
+    )
+
+    def __init__(self, key, blueprint, realization, get):
+        """:param key: (group, name)
+        :param blueprint: normalized entity configuration
+        :param realization: realization of the entity
+        :param get: function (group, name) -> instance,
+                    used by the lazy deps and the providers"""
+        self.key = key
+        self.fullname = '{}:{}'.format(*key)
+        self.type = blueprint.get('__type__')
+        self.realization = realization
+        providers = blueprint.get('__providers__', ())
+        # "$static" deps and providers
+        self.kwargs = {}
+        # manageable deps: (arg_name, group or None, entity or entities)
+        deps = []
+        # lazy deps: (arg_name, provider)
+        lazy = []
+        # plan refers to the container (via the providers)
+        self.bound = False
+        for dep_name, dep_val in blueprint.items():
+            # skip "__internal__" deps
+            if dep_name.startswith('_'):
+                continue
+            elif dep_name.startswith('$'):
+                self.kwargs[dep_name[1:]] = dep_val
+            elif dep_name.lstrip('~') in providers:
+                self.kwargs[dep_name.lstrip('~')] = provider(get, *dep_val)
+                self.bound = True
+            elif dep_name.startswith('~'):
+                lazy.append((dep_name[1:], provider(get, *dep_val)))
+                self.bound = True
+            else:
+                deps.append((dep_name,) + tuple(dep_val))
+        self.deps = tuple(deps)
+        self.lazy = tuple(lazy)
+        # flat sequence of all the deps (to be resolved in that order)
+        # and slots (arg_name, start, stop or None) of their values
+        keys = []
+        slots = []
+        for dep_name, first, rest in self.deps:
+            if first is None:
+                slots.append((dep_name, len(keys), len(keys) + len(rest)))
+                keys.extend(rest)
+            else:
+                slots.append((dep_name, len(keys), None))
+                keys.append((first, rest))
+        self.keys = tuple(keys)
+        self.slots = tuple(slots)
+
+    def make_kwargs(self, values):
+        """Returns the kwargs for the realization
+        :param values: values of the deps in order of self.keys
+        :type values: list"""
+        kwargs = self.kwargs.copy()
+        for dep_name, factory in self.lazy:
+            kwargs[dep_name] = LazyProxy(factory)
+        for dep_name, start, stop in self.slots:
+            if stop is None:
+                kwargs[dep_name] = values[start]
+            else:
+                kwargs[dep_name] = tuple(values[start:stop])
+        return kwargs
+
+
 class Injectable(type):
     "Provides the __init__ with the suitable args, based on dependencies"
 
@@ -50,21 +295,259 @@ class Injectable(type):
 class Container(object):
     "DI Container"
 
-    _TYPES = ('static', 'singleton', None)
+    _TYPES = (
+        'static', 'singleton', 'scoped', 'thread', 'context', 'pooled', None)
+    _INTERNAL_ATTRS = (
+        '__realization__', '__type__', '__fork__', '__providers__',
+        '__pool_size__')
+    _DEFAULT_POOL_SIZE = 8
+    # generated factories of the transient entities call each other
+    # recursively, so the deeper ones are resolved by the get
+    _MAX_FACTORY_DEPTH = 100
+    _FORK_POLICIES = ('share', 'recreate', 'lazy')
+    _PRELOAD_POLICIES = ('lazy', 'eager')
+    # memo of the prepared configurations (see _prepare)
+    _prepared = {}
+    _PREPARED_CACHE_SIZE = 64
 
-    def __init__(self, config):
+    def __init__(self, config, compile=False, preload='lazy', trusted=False):
         """:param config: configuration
-        :type config: dict"""
-        errors = self.collect_errors(config)
-        if errors:
-            raise ValueError('\n'.join(['Config errors:'] + errors))
-        self._config = self._normalize(config)
+        :type config: dict
+        :param compile: generate the specialized factory functions
+        :type compile: bool
+        :param preload: "lazy" - realizations are imported on first use,
+                        "eager" - all of them are imported at once
+        :type preload: str
+        :param trusted: configuration is already validated
+                        (the validation will be skipped)
+        :type trusted: bool"""
+        self._setup(self._prepare(config, trusted), compile, preload)
+
+    def _setup(self, prepared, compile, preload):
+        """Sets up the container for the prepared configuration
+        :param prepared: (config, graph, levels), see _prepare"""
+        if preload not in self._PRELOAD_POLICIES:
+            raise ValueError('Unknown preload policy: {}!'.format(preload))
+        self._config, self._graph, self._levels = prepared
+        self._init_state(compile)
+        if preload == 'eager':
+            self.preload()
+
+    def _init_state(self, compile):
+        """Initializes the caches and the other state of the container
+        :param compile: generate the specialized factory functions
+        :type compile: bool"""
         self._entity_cache = {}
         self._singletones = {}
+        self._plans = {}
+        self._factories = {}
+        self._codegen = compile
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._pending = {}
+        # stack of the active scopes
+        self._scopes = Local(())
+        self._thread_local = threading.local()
+        self._context_cache = ContextCache()
+        # {(group, name): Pool}
+        self._pools = {}
+        # singletones, shared by the parent container (see child)
+        self._borrowed = {}
+        # reversed dependency graph and the memo of the transitive
+        # closures (see dependencies and dependents)
+        self._reverse = None
+        self._closures = {}
+        # {(group, name): level of the entity in the graph}
+        self._depths = None
+        # {(group, name): seconds}
+        self.import_times = {}
+        self._observers = ()
+
+    @classmethod
+    def _prepare(cls, config, trusted=False):
+        """Validates and normalizes the configuration, builds the
+        dependency graph and its topological order.
+        Results are memoized by the content of the configuration,
+        so they must not be mutated. The mutable "$static" values
+        aren't shared: the container gets the caller's own ones
+        :param config: initial configuration
+        :type config: dict
+        :param trusted: skip the validation
+        :type trusted: bool"""
+        try:
+            key = (cls, trusted, freeze(config))
+        except TypeError:  # some values are unhashable
+            key = None
+        else:
+            try:
+                normalized, deps, levels, paths = cls._prepared[key]
+            except KeyError:
+                pass
+            else:
+                if paths:
+                    normalized = _rebind_statics(normalized, paths, config)
+                return normalized, deps, levels
+
+        if not trusted:
+            errors = cls.collect_errors(config)
+            if errors:
+                raise ValueError('\n'.join(['Config errors:'] + errors))
+        normalized = cls._normalize(config)
+        deps = graph.build(normalized)
+        result = normalized, deps, _sort_graph(deps, normalized)
+        if key is not None:
+            if len(cls._prepared) >= cls._PREPARED_CACHE_SIZE:
+                cls._prepared.clear()
+            cls._prepared[key] = result + (_mutable_statics(normalized),)
+        return result
+
+    def save_snapshot(self, path):
+        """Saves the normalized and validated configuration with its
+        dependency graph and topological order into the file,
+        so the container can be loaded by the from_snapshot quickly
+        :param path: file name
+        :type path: str"""
+        with open(path, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER)
+            pickle.dump(
+                (self._config, self._graph, self._levels),
+                f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_snapshot(cls, path, use_mmap=False, compile=False,
+                      preload='lazy'):
+        """Returns the container, loaded from the snapshot file,
+        made by the save_snapshot. Validation and normalization
+        are skipped, the snapshot of other format version
+        leads to ValueError
+        :param path: file name
+        :type path: str
+        :param use_mmap: read the file via memory mapping (just the I/O
+                         detail: the loaded objects are private to the
+                         process anyway)
+        :type use_mmap: bool
+        :param compile: see __init__
+        :param preload: see __init__"""
+        with open(path, 'rb') as f:
+            if use_mmap:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = f
+            try:
+                if data.read(len(_SNAPSHOT_HEADER)) != _SNAPSHOT_HEADER:
+                    raise ValueError(
+                        '{} is not a snapshot of version {}!'.format(
+                            path, _SNAPSHOT_VERSION))
+                prepared = pickle.load(data)
+            finally:
+                if use_mmap:
+                    data.close()
+        result = cls.__new__(cls)
+        result._setup(prepared, compile, preload)
+        return result
+
+    def _override(self, overrides):
+        """Returns the tuple (config, graph, levels, changed keys,
+        affected keys) for the configuration with the overridden entities.
+        Overrides are merged into the current blueprints, the unchanged
+        groups of configuration are shared, not copied.
+        Overridden "__default__" of the group is merged into every
+        entity of that group (over its current blueprint)
+        :param overrides: configuration of the overridden entities
+        :type overrides: dict"""
+        errors = self.collect_errors(overrides, known=self._config)
+        if errors:
+            raise ValueError('\n'.join(['Config errors:'] + errors))
+        overrides = dict(overrides)
+        for grp, ents in list(overrides.items()):
+            if '__default__' in ents:
+                ents = overrides[grp] = dict(ents)
+                for ent in self._config.get(grp, ()):
+                    ents.setdefault(ent, {})
+        config = self._config.copy()
+        deps = self._graph.copy()
+        changed = []
+        for grp, ents in self._normalize(overrides).items():
+            section = config[grp] = config.get(grp, {}).copy()
+            for ent, blueprint in ents.items():
+                if ent in section:
+                    blueprint = merge(
+                        section[ent].copy(), blueprint,
+                        _merge_upto_lvl2_then_take_other)
+                section[ent] = blueprint
+                deps[(grp, ent)] = tuple(graph.dependencies(blueprint))
+                changed.append((grp, ent))
+
+        return (
+            config, deps, _sort_graph(deps, config), changed,
+            graph.closure(graph.reverse(deps), changed)
+        )
+
+    def child(self, overrides, share_singletones=False):
+        """Returns the derived container with some entities overridden.
+        Child shares the normalized configuration and the imported
+        realizations of the parent (and the already built singletones,
+        if requested), except the ones, affected by the overrides
+        :param overrides: configuration of the overridden entities
+        :type overrides: dict
+        :param share_singletones: take the singletones of the parent
+        :type share_singletones: bool"""
+        config, deps, levels, changed, affected = self._override(overrides)
+        # realization and plan of the entity depend only on its blueprint
+        changed = set(changed)
+        result = type(self).__new__(type(self))
+        result._config, result._graph, result._levels = config, deps, levels
+        result._init_state(self._codegen)
+        result._observers = self._observers
+        for src, dst in (
+            (self._entity_cache, result._entity_cache),
+            (self.import_times, result.import_times),
+        ):
+            dst.update(
+                (key, val) for key, val in src.items() if key not in changed)
+        # plans with the providers are bound to the parent container
+        result._plans.update(
+            (key, plan) for key, plan in self._plans.items()
+            if key not in changed and not plan.bound)
+        if share_singletones:
+            result._borrowed = dict(
+                (key, val) for key, val in self._singletones.items()
+                if key not in affected)
+            result._singletones.update(result._borrowed)
+        return result
+
+    def update(self, overrides, timeout=None):
+        """Reconfigures the container in place: the overrides are merged
+        into the current blueprints and only the affected (overridden and
+        transitively dependent) singletones and pools are evicted
+        and disposed (as by the close, the first error is raised after
+        the reconfiguration). Already built instances of other lifetimes
+        live till the end of their scopes/threads/contexts.
+        Returns the set of the affected keys (group, name)
+        :param overrides: configuration of the overridden entities
+        :type overrides: dict
+        :param timeout: time (in seconds) to wait for each disposed one
+        :type timeout: float"""
+        config, deps, levels, changed, affected = self._override(overrides)
+        self._config, self._graph, self._levels = config, deps, levels
+        self._reverse = None
+        self._closures = {}
+        self._depths = None
+        for key in changed:
+            self._entity_cache.pop(key, None)
+            self._plans.pop(key, None)
+            self.import_times.pop(key, None)
+        evicted = self._take_disposables(affected)
+        for key in affected:
+            # generated factories refer to the factories of deps
+            self._factories.pop(key, None)
+        self._dispose(evicted, timeout)
+        return affected
 
     @staticmethod
     def _normalize(config):
         """Rebuilds the configuration for the speedup purpose
+        (initial configuration stays untouched)
         :param config: initial configuration
         :type config: dict"""
 
@@ -73,6 +556,7 @@ class Container(object):
             ```
             "name": (None, (('group', 'entity'),...))
             "name": ('group', 'entity')
+            "~name": ('group', 'entity')  # lazy one ("~entity" in config)
             "$name": value
             "__name__": value
             ```"""
@@ -84,6 +568,8 @@ class Container(object):
                     kk, group = (k.split(':') + [k])[:2]
                     if isinstance(v, list):
                         vv = (None, tuple((group, i) for i in v))
+                    elif isinstance(v, _STRING_TYPES) and v.startswith('~'):
+                        kk, vv = '~' + kk, (group, v[1:])
                     else:
                         vv = (group, v)
                     result[kk] = vv
@@ -91,7 +577,7 @@ class Container(object):
 
         result = {}
         for sect, elems in config.items():
-            plan = norm_deps(elems.pop('__default__', {}))
+            plan = norm_deps(elems.get('__default__', {}))
             section = result[sect] = {}
             for el_name, customization in elems.items():
                 if el_name != '__default__':
@@ -121,10 +607,41 @@ class Container(object):
         :type name: str"""
         blueprint = self._config[group][name]
         key = (group, name)
-        return (
-            blueprint,
-            self._entity_cache.get(key) or self._entity_cache.setdefault(
-                key, self._get_entity(blueprint['__realization__']))
+        realization = self._entity_cache.get(key, _MISSING)
+        if realization is _MISSING:
+            start = time.time()
+            realization = self._get_entity(blueprint['__realization__'])
+            seconds = self.import_times[key] = time.time() - start
+            if self._observers:
+                self._notify(
+                    'on_import', key, blueprint['__realization__'], seconds)
+            realization = self._entity_cache.setdefault(key, realization)
+        return blueprint, realization
+
+    def preload(self, groups=None, max_workers=None):
+        """Imports the realizations of all the entities of the groups
+        (all groups by default) using the parallel threads (their number
+        is bounded, see default_workers). Python 2 imports everything
+        under the global lock, so the imports are serial there.
+        Returns the import times {(group, name): seconds}
+        :param groups: groups to preload
+        :type groups: iterable
+        :param max_workers: number of the threads
+        :type max_workers: int
+        """
+        if not _PARALLEL_IMPORTS:
+            max_workers = 1
+        keys = [
+            (grp, ent)
+            for grp in (self._config if groups is None else groups)
+            for ent in self._config[grp]
+            if (grp, ent) not in self._entity_cache
+        ]
+        _parallel_map(
+            lambda key: self._get_blueprint(*key), keys, max_workers)
+        return dict(
+            (key, self.import_times[key])
+            for key in keys if key in self.import_times
         )
 
     def itergroup(self, group):
@@ -140,87 +657,755 @@ class Container(object):
             for i in self._config[group]
         )
 
-    def get(self, group, name):
-        """Returns the fully configured entity instance
+    def _get_plan(self, group, name):
+        """Returns the (cached) resolution plan of the entity
         :param group: entity group
         :type group: str
         :param name: entity name
-        :type name: str
-        """
-        fullname = '{}:{}'.format(group, name)
+        :type name: str"""
+        key = (group, name)
+        try:
+            return self._plans[key]
+        except KeyError:
+            pass
         try:
             blueprint, realization = self._get_blueprint(group, name)
         except KeyError:
-            raise ValueError("{} is not configured!".format(fullname))
+            raise ValueError("{}:{} is not configured!".format(group, name))
+        return self._plans.setdefault(
+            key, _Plan(key, blueprint, realization, self.get))
 
-        typ = blueprint.get('__type__')
+    def get(self, group, name):
+        """Returns the fully configured entity instance
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str
+        """
+        plan = self._plans.get((group, name)) or self._get_plan(group, name)
+        typ = plan.type
 
         if typ == 'static':
-            result = realization
-        else:
-            is_singleton = typ == 'singleton'
-            if is_singleton:
-                result = self._singletones.get((group, name))
-            if not is_singleton or not result:
-                deps = {}
-                for dep_name, dep_val in blueprint.items():
-                    # handle "__interdal__" deps
-                    if dep_name.startswith('_'):
+            return plan.realization
+
+        if typ == 'singleton':
+            result = self._singletones.get(plan.key, _MISSING)
+            if result is not _MISSING:
+                return result
+        elif (
+            typ is None and not plan.keys and not plan.lazy and
+            not self._observers
+        ):
+            # transient entity without deps
+            try:
+                return plan.realization(**plan.kwargs)
+            except Exception as e:
+                raise EntityConfiguringError(path=(plan.fullname,), exc=e)
+
+        return self._resolve(plan)
+
+    def _resolve(self, plan, memo=None):
+        """Builds the entity with all its deps. Explicit stack is used
+        instead of the recursion, so the depth of graph is not limited
+        :param plan: resolution plan
+        :type plan: _Plan
+        :param memo: storage for the transient instances to be reused
+        :type memo: dict"""
+        # frames: [plan, values of deps, lock, cache for the result]
+        stack = []
+        plans = self._plans
+        singletones = self._singletones
+        observers = self._observers
+        try:
+            result = self._push(stack, plan, memo)
+            while stack:
+                frame = stack[-1]
+                plan, values = frame[0], frame[1]
+                keys = plan.keys
+                # resolving the deps until some of them needs the new frame
+                while len(values) < len(keys):
+                    key = keys[len(values)]
+                    dep = plans.get(key) or self._get_plan(*key)
+                    typ = dep.type
+                    if typ == 'static':
+                        values.append(dep.realization)
                         continue
-                    # handle "$static" deps
-                    elif dep_name.startswith('$'):
-                        deps[dep_name[1:]] = dep_val
+                    if typ == 'singleton':
+                        result = singletones.get(key, _MISSING)
+                        if result is _MISSING:
+                            result = self._push(stack, dep)
+                            if result is _MISSING:
+                                break
+                    elif typ is not None:
+                        result = self._push(stack, dep)
+                        if result is _MISSING:
+                            break
+                    elif memo is not None:
+                        result = self._push(stack, dep, memo)
+                        if result is _MISSING:
+                            break
+                    elif dep.keys or dep.lazy:
+                        stack.append([dep, [], None, None])
+                        if observers:
+                            self._notify('on_resolve_start', key)
+                        break
                     else:
-                        # handle manageable deps
-                        first, rest = dep_val
+                        # transient entity without deps
+                        if observers:
+                            self._notify('on_resolve_start', key)
                         try:
-                            if first is None:
-                                deps[dep_name] = tuple(
-                                    self.get(g, e) for (g, e) in rest
-                                )
-                            else:
-                                deps[dep_name] = self.get(first, rest)
-                        except EntityConfiguringError as e:
-                            e.path = (fullname,) + e.path
-                            raise
-                try:
-                    result = realization(**deps)
-                except Exception as e:
-                    raise EntityConfiguringError(path=(fullname,), exc=e)
-                if is_singleton:
-                    self._singletones[(group, name)] = result
+                            result = dep.realization(**dep.kwargs)
+                        except Exception as e:
+                            if observers:
+                                self._notify('on_error', key, e)
+                            raise EntityConfiguringError(path=tuple(
+                                f[0].fullname for f in stack
+                            ) + (dep.fullname,), exc=e)
+                        if observers:
+                            self._notify('on_resolve_end', key, result)
+                    values.append(result)
+                else:
+                    try:
+                        result = plan.realization(**plan.make_kwargs(values))
+                    except Exception as e:
+                        raise EntityConfiguringError(
+                            path=tuple(f[0].fullname for f in stack), exc=e)
+                    stack.pop()
+                    if frame[3] is not None:
+                        frame[3][plan.key] = result
+                    if frame[2] is not None:
+                        frame[2].release()
+                    if observers:
+                        self._notify('on_resolve_end', plan.key, result)
+                        if plan.type == 'singleton':
+                            self._notify(
+                                'on_singleton_created', plan.key, result)
+                    if stack:
+                        stack[-1][1].append(result)
+            return result
+        except Exception as e:
+            if observers:
+                for frame in reversed(stack):
+                    self._notify(
+                        'on_error', frame[0].key,
+                        getattr(e, 'exc', e))
+            raise
+        finally:
+            # error occurred, so the held locks must be released
+            for frame in stack:
+                if frame[2] is not None:
+                    frame[2].release()
+
+    def _push(self, stack, plan, memo=None):
+        """Pushes the frame for the entity building onto the stack and
+        returns _MISSING, or returns the already built instance
+        (singleton, scoped one, memoized transient one etc)
+        :param stack: resolution stack
+        :type stack: list
+        :param plan: resolution plan
+        :type plan: _Plan
+        :param memo: storage for the transient instances to be reused
+        :type memo: dict"""
+        lock = None
+        cache = self._get_cache(plan)
+        if cache is None:
+            cache = memo
+        if cache is not None:
+            result = cache.get(plan.key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if plan.type == 'singleton':
+                lock = self._get_lock(plan.key)
+                lock.acquire()
+                # other thread could build the singleton meanwhile
+                result = cache.get(plan.key, _MISSING)
+                if result is not _MISSING:
+                    lock.release()
+                    return result
+        stack.append([plan, [], lock, cache])
+        if self._observers:
+            self._notify('on_resolve_start', plan.key)
+        return _MISSING
+
+    def add_observer(self, observer):
+        """Adds the observer of the resolution
+        (see yadic.observe.Observer)
+        :param observer: observer
+        :type observer: yadic.observe.Observer"""
+        self._observers += (observer,)
+
+    def remove_observer(self, observer):
+        """Removes the observer of the resolution
+        :param observer: observer
+        :type observer: yadic.observe.Observer"""
+        self._observers = tuple(
+            o for o in self._observers if o is not observer)
+
+    def _notify(self, event, *args):
+        """Calls the hook of all the observers"""
+        for observer in self._observers:
+            getattr(observer, event)(*args)
+
+    def _get_cache(self, plan):
+        """Returns the storage of the built instances
+        for the entity of some lifetime (or None for the transient one)
+        :param plan: resolution plan
+        :type plan: _Plan"""
+        typ = plan.type
+        if typ == 'singleton':
+            return self._singletones
+        elif typ == 'scoped':
+            scopes = self._scopes.get()
+            if not scopes:
+                raise ValueError(
+                    '{} is scoped, but no scope is active!'.format(
+                        plan.fullname))
+            return scopes[-1]
+        elif typ == 'thread':
+            try:
+                return self._thread_local.instances
+            except AttributeError:
+                cache = self._thread_local.instances = {}
+                return cache
+        elif typ == 'context':
+            return self._context_cache
+        elif typ == 'pooled':
+            raise ValueError(
+                '{} is pooled, use the acquire()!'.format(plan.fullname))
+        return None
+
+    @contextmanager
+    def scope(self):
+        """Returns the context manager, which activates the new scope.
+        Instances of the "scoped" entities are cached in the innermost
+        active scope and are disposed (closed) at its exit"""
+        scopes = self._scopes.get()
+        scope = Scope()
+        self._scopes.set(scopes + (scope,))
+        try:
+            yield scope
+        finally:
+            self._scopes.set(scopes)
+            scope.close()
+
+    @contextmanager
+    def acquire(self, group, name, timeout=None):
+        """Returns the context manager, which takes the instance of the
+        "pooled" entity from its pool and returns it back at the exit.
+        If the block raises, the instance is disposed instead
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str
+        :param timeout: maximal time (in seconds) to wait for the instance
+        :type timeout: float
+        """
+        pool = self._get_pool(group, name)
+        instance = pool.acquire(timeout)
+        try:
+            yield instance
+        except BaseException:
+            pool.discard(instance)
+            raise
+        else:
+            pool.release(instance)
+
+    def _get_pool(self, group, name):
+        """Returns the pool of the "pooled" entity
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str"""
+        key = (group, name)
+        try:
+            return self._pools[key]
+        except KeyError:
+            pass
+        plan = self._plans.get(key) or self._get_plan(group, name)
+        if plan.type != 'pooled':
+            raise ValueError('{} is not pooled!'.format(plan.fullname))
+        # instances are built as the transient ones
+        transient = copy(plan)
+        transient.type = None
+        size = self._config[group][name].get(
+            '__pool_size__', self._DEFAULT_POOL_SIZE)
+        with self._locks_guard:
+            return self._pools.setdefault(
+                key, Pool(partial(self._resolve, transient), size))
+
+    def pool_stats(self):
+        """Returns the statistics of the pools (see yadic.pool.Pool.stats)
+        {(group, name): {'hits': ..., 'waits': ..., 'creations': ...}}"""
+        return dict((key, pool.stats()) for key, pool in self._pools.items())
+
+    def get_many(self, keys, share=False):
+        """Returns the list of the fully configured entity instances
+        :param keys: pairs (group, name)
+        :type keys: iterable
+        :param share: share the transient instances between all the
+                      entities of the batch (every transient entity
+                      will be built only once per call)
+        :type share: bool
+        """
+        memo = {} if share else None
+        result = []
+        for group, name in keys:
+            plan = (
+                self._plans.get((group, name)) or
+                self._get_plan(group, name))
+            if plan.type == 'static':
+                result.append(plan.realization)
+            else:
+                result.append(self._resolve(plan, memo))
         return result
 
+    def get_group(self, group, share=False):
+        """Returns the dict {name: instance} for all the entities
+        of the group
+        :param group: entity group
+        :type group: str
+        :param share: share the transient instances (see get_many)
+        :type share: bool
+        """
+        if group not in self._config:
+            raise KeyError("Unknown group: {}!".format(group))
+        names = list(self._config[group])
+        return dict(zip(
+            names, self.get_many(((group, n) for n in names), share)))
+
+    def warm_up(self, groups=None, max_workers=None):
+        """Instantiates all the singletones (of the specified groups and
+        the ones they depend on) level by level in dependency order,
+        entities of the same level are built in parallel threads.
+        Singletones with the "lazy" fork policy (and the ones, depending
+        on them) are skipped: they are built in the forked workers.
+        Returns the build times {(group, name): seconds}
+        :param groups: groups to warm up (all groups by default)
+        :type groups: iterable
+        :param max_workers: number of the threads
+        :type max_workers: int
+        """
+        config = self._config
+
+        def is_singleton(key):
+            return config[key[0]][key[1]].get('__type__') == 'singleton'
+
+        lazy = graph.closure(self._get_reverse(), [
+            (grp, ent)
+            for grp, ents in config.items()
+            for ent, blueprint in ents.items()
+            if blueprint.get('__fork__') == 'lazy'
+        ])
+        roots = [
+            (grp, ent)
+            for grp in (config if groups is None else groups)
+            for ent in config[grp]
+            if is_singleton((grp, ent)) and (grp, ent) not in lazy
+        ]
+        times = {}
+
+        def build(key):
+            start = time.time()
+            self.get(*key)
+            times[key] = time.time() - start
+
+        needed = graph.closure(self._graph, roots)
+        for level in self._levels:
+            _parallel_map(
+                build,
+                [key for key in level if key in needed and is_singleton(key)],
+                max_workers)
+        return times
+
+    def after_fork(self):
+        """Must be called in the forked process (e.g. via
+        os.register_at_fork(after_in_child=container.after_fork)).
+        Drops the singletones with the "recreate" fork policy and the ones
+        depending on them, so they will be rebuilt on demand.
+        Pooled and "thread" instances are dropped as well.
+        Dropped instances aren't closed, because they are still used
+        by the parent process.
+        Instances of the scopes and of the context, which are active
+        in the forking thread, are kept (the child continues that
+        thread), so fork outside of them to avoid sharing.
+        Returns the set of the dropped keys (group, name)"""
+        # locks could be held by the threads, which aren't forked
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._pending = {}
+        # pooled and per-thread instances (e.g. connections)
+        # aren't shared with the parent process
+        self._pools = {}
+        self._thread_local = threading.local()
+        recreate = graph.closure(self._get_reverse(), [
+            (grp, ent)
+            for grp, ents in self._config.items()
+            for ent, blueprint in ents.items()
+            if blueprint.get('__fork__') == 'recreate'
+        ])
+        dropped = set()
+        for key in recreate:
+            if self._singletones.pop(key, _MISSING) is not _MISSING:
+                dropped.add(key)
+        return dropped
+
+    def close(self, timeout=None):
+        """Disposes (see yadic.scope.dispose) the built singletones
+        in reverse dependency order: each entity is disposed before
+        its deps, the independent ones are disposed in parallel threads.
+        Idle instances of the pools are disposed too, the singletones
+        of the parent container (see child) are left intact.
+        After all, the first error (if any) is raised.
+        Container stays usable: the instances are rebuilt on demand
+        :param timeout: time (in seconds) to wait for each instance
+        :type timeout: float"""
+        self._dispose(self._take_disposables(), timeout)
+
+    @staticmethod
+    def _dispose(disposables, timeout):
+        """Disposes the pools and the singletones level by level
+        and raises the first error (if any)
+        :param disposables: see _take_disposables
+        :param timeout: time (in seconds) to wait for each instance
+        :type timeout: float"""
+        pools, levels = disposables
+        errors = []
+        for pool in pools:
+            try:
+                pool.close()
+            except Exception as e:
+                errors.append(e)
+        for instances in levels:
+            failed = dispose_parallel(instances, timeout)
+            errors.extend(failed[key] for key in sorted(failed))
+        if errors:
+            raise errors[0]
+
+    def aclose(self, timeout=None):
+        """Returns the awaitable, which disposes the built singletones
+        (see close and yadic.aio.close)
+        :param timeout: time (in seconds) to wait for each instance
+        :type timeout: float"""
+        # imported here, because yadic.aio isn't a Python 2 code
+        from yadic.aio import close
+        return close(self, timeout)
+
+    def _take_disposables(self, keys=None):
+        """Forgets the pools and the built singletones and returns them:
+        (pools, [{key: singleton} for each level in reverse order])
+        :param keys: keys (group, name) to forget (all by default)
+        :type keys: set"""
+        if keys is None:
+            pools, self._pools = list(self._pools.values()), {}
+            # cleared in place: the generated factories refer to that dict
+            singletones = dict(self._singletones)
+            self._singletones.clear()
+            borrowed, self._borrowed = self._borrowed, {}
+        else:
+            pools = [
+                self._pools.pop(key) for key in keys if key in self._pools]
+            singletones = dict(
+                (key, self._singletones.pop(key)) for key in keys
+                if key in self._singletones)
+            borrowed = dict(
+                (key, self._borrowed.pop(key)) for key in keys
+                if key in self._borrowed)
+        levels = []
+        for level in reversed(self._levels):
+            instances = {}
+            for key in level:
+                instance = singletones.get(key, _MISSING)
+                if (
+                    instance is not _MISSING and
+                    borrowed.get(key, _MISSING) is not instance
+                ):
+                    instances[key] = instance
+            if instances:
+                levels.append(instances)
+        return pools, levels
+
+    def dependencies(self, group, name, transitive=True):
+        """Returns the set of the entities (group, name),
+        which the entity depends on
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str
+        :param transitive: include the deps of the deps and so on
+        :type transitive: bool
+        """
+        return self._query(self._graph, 'deps', (group, name), transitive)
+
+    def dependents(self, group, name, transitive=True):
+        """Returns the set of the entities (group, name),
+        which depend on the entity
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str
+        :param transitive: include the dependents of the dependents
+                           and so on
+        :type transitive: bool
+        """
+        return self._query(
+            self._get_reverse(), 'dependents', (group, name), transitive)
+
+    def _query(self, index, kind, key, transitive):
+        """Returns the adjacent (or reachable) nodes of the index
+        :param index: forward or reversed dependency graph
+        :type index: dict
+        :param kind: kind of the query (the part of the memo key)
+        :type kind: str
+        :param key: (group, name)
+        :type key: tuple"""
+        if key not in self._graph:
+            raise ValueError('{}:{} is not configured!'.format(*key))
+        if not transitive:
+            return frozenset(index.get(key, ()))
+        memo_key = (kind, key)
+        try:
+            return self._closures[memo_key]
+        except KeyError:
+            pass
+        result = graph.closure(index, index.get(key, ()))
+        result.discard(key)
+        return self._closures.setdefault(memo_key, frozenset(result))
+
+    def _get_depth(self, key):
+        """Returns the level of the entity in the dependency graph
+        (the length of the longest chain of its deps)
+        :param key: (group, name)
+        :type key: tuple"""
+        depths = self._depths
+        if depths is None:
+            depths = self._depths = dict(
+                (node, level)
+                for level, nodes in enumerate(self._levels)
+                for node in nodes)
+        return depths.get(key, 0)
+
+    def _get_reverse(self):
+        """Returns the reversed dependency graph (built once)"""
+        result = self._reverse
+        if result is None:
+            result = self._reverse = graph.reverse(self._graph)
+        return result
+
+    def aget(self, group, name):
+        """Returns the awaitable, which resolves to the fully configured
+        entity instance (see yadic.aio.resolve)
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str
+        """
+        # imported here, because yadic.aio isn't a Python 2 code
+        from yadic.aio import resolve
+        return resolve(self, group, name)
+
+    def _get_lock(self, key):
+        """Returns the lock, guarding the creation of the singleton
+        :param key: (group, name)
+        :type key: tuple"""
+        try:
+            return self._locks[key]
+        except KeyError:
+            with self._locks_guard:
+                # reentrant: the realization may call
+                # the container back in the same thread
+                return self._locks.setdefault(key, threading.RLock())
+
+    def factory(self, group, name):
+        """Returns the zero-argument callable, which builds the entity.
+        In "compile" mode that callable is generated
+        specially for the entity
+        :param group: entity group
+        :type group: str
+        :param name: entity name
+        :type name: str
+        """
+        key = (group, name)
+        try:
+            return self._factories[key]
+        except KeyError:
+            pass
+        if self._codegen:
+            fn = self._generate_factory(self._get_plan(group, name))
+        else:
+            fn = partial(self.get, group, name)
+        return self._factories.setdefault(key, fn)
+
+    def _generate_factory(self, plan):
+        """Generates the factory function for the entity plan:
+        transient deps are called via their own factories,
+        static ones, "$static" kwargs and providers are bound as constants,
+        singletones are taken from the cache directly
+        :param plan: resolution plan
+        :type plan: _Plan"""
+        if plan.type == 'static':
+            realization = plan.realization
+            return lambda: realization
+        if (
+            plan.type is None and
+            self._get_depth(plan.key) > self._MAX_FACTORY_DEPTH
+        ):
+            return partial(self.get, *plan.key)
+
+        namespace = {
+            'EntityConfiguringError': EntityConfiguringError,
+            'get': self.get,
+            'singletones': self._singletones,
+            'MISSING': _MISSING,
+            'KEY': plan.key,
+            'FULLNAME': plan.fullname,
+            'REALIZATION': plan.realization,
+            'LazyProxy': LazyProxy,
+        }
+
+        if plan.type == 'singleton':
+            source = '\n'.join([
+                'def factory():',
+                '    result = singletones.get(KEY, MISSING)',
+                '    if result is not MISSING:',
+                '        return result',
+                '    return get(*KEY)',
+            ])
+        elif plan.type is None:
+            def ref(g, e):
+                var = 'f{}'.format(len(namespace))
+                namespace[var] = self.factory(g, e)
+                return var + '()'
+
+            args = []
+            for k, v in plan.kwargs.items():
+                var = 'c{}'.format(len(namespace))
+                namespace[var] = v
+                args.append((k, var))
+            for k, v in plan.lazy:
+                var = 'p{}'.format(len(namespace))
+                namespace[var] = v
+                args.append((k, 'LazyProxy({})'.format(var)))
+            lines = ['def factory():']
+            if plan.deps:
+                lines.append('    try:')
+                for dep_name, first, rest in plan.deps:
+                    var = 'd{}'.format(len(args))
+                    if first is None:
+                        expr = '({})'.format(''.join(
+                            ref(g, e) + ', ' for (g, e) in rest))
+                    else:
+                        expr = ref(first, rest)
+                    lines.append('        {} = {}'.format(var, expr))
+                    args.append((dep_name, var))
+                lines.extend([
+                    '    except EntityConfiguringError as e:',
+                    '        e.path = (FULLNAME,) + e.path',
+                    '        raise',
+                ])
+            # the keywords (e.g. "$class") can't be the named args
+            named = [a for a in args if not keyword.iskeyword(a[0])]
+            if len(named) < len(args):
+                named.append(('**{' + ', '.join(
+                    '{!r}: {}'.format(*a)
+                    for a in args if keyword.iskeyword(a[0])) + '}',))
+            lines.extend([
+                '    try:',
+                '        return REALIZATION({})'.format(', '.join(
+                    '='.join(a) for a in named)),
+                '    except Exception as e:',
+                '        raise EntityConfiguringError(',
+                '            path=(FULLNAME,), exc=e)',
+            ])
+            source = '\n'.join(lines)
+        else:
+            return partial(self.get, *plan.key)
+
+        exec(compile(source, '<factory {}>'.format(plan.fullname), 'exec'),
+             namespace)
+        return namespace['factory']
+
     @classmethod
-    def collect_errors(cls, cfg):
+    def collect_errors(cls, cfg, max_errors=None, known=None):
         """Returns the list of errors of the configuration
         :param cfg: configuration
         :type cfg: dict
+        :param max_errors: stop after this number of errors
+        :type max_errors: int
+        :param known: already configured entities {group: names}
+                      (when the partial configuration is checked)
+        :type known: dict
         """
         errors = []
+        known = known or {}
 
-        def wrong(what, names):
-            errors.append(
-                '{0!r} is a wrong {1} name!'.format(':'.join(names), what))
-
-        is_ident = re.compile(r'(?i)^[a-z]\w*$').match
-        is_valid_name = re.compile(
-            r'(?i)^(?:\$?[a-z]\w*)|(?:[a-z]\w*:[a-z]\w*)$').match
-
-        for group, elems in cfg.items():
-            if not is_ident(group):
-                wrong('group', (group,))
-            for el, cfg in elems.items():
-                if not is_ident(el) and el != '__default__':
-                    wrong('element', (group, el))
-                for k, v in cfg.items():
-                    if not (
-                        is_valid_name(k) or
-                        k in ('__realization__', '__type__')
+        def wrong(msg, *args):
+            errors.append(msg.format(*args))
+            if max_errors is not None and len(errors) >= max_errors:
+                raise _TooManyErrors
+
+        def wrong_name(what, names):
+            wrong('{0!r} is a wrong {1} name!', ':'.join(names), what)
+
+        def exists(group, name):
+            return (
+                name != '__default__' and
+                name in cfg.get(group, ()) or name in known.get(group, ())
+            )
+
+        def check_deps(group, el, cfg):
+            for k, v in cfg.items():
+                if not _is_valid_attr(k):
+                    if k not in cls._INTERNAL_ATTRS:
+                        wrong_name('attr', (group, el, k))
+                    continue
+                if k.startswith('$'):
+                    continue
+                dep_group = k.split(':')[-1]
+                if isinstance(v, _STRING_TYPES) and v.startswith('~'):
+                    v = v[1:]  # lazy one
+                for dep in (v if isinstance(v, list) else [v]):
+                    if not isinstance(dep, _STRING_TYPES):
+                        wrong('{0!r} has a wrong dependency {1!r}!',
+                              ':'.join((group, el, k)), dep)
+                    elif not exists(dep_group, dep):
+                        wrong('{0!r} depends on unknown {1!r}!',
+                              ':'.join((group, el)),
+                              ':'.join((dep_group, dep)))
+
+        try:
+            for group, elems in cfg.items():
+                if not _is_ident(group):
+                    wrong_name('group', (group,))
+                default = elems.get('__default__', {})
+                for el, el_cfg in elems.items():
+                    if el != '__default__':
+                        if not _is_ident(el):
+                            wrong_name('element', (group, el))
+                        if not (
+                            '__realization__' in el_cfg or
+                            '__realization__' in default or
+                            el in known.get(group, ())
+                        ):
+                            wrong('{0!r} has no realization!',
+                                  ':'.join((group, el)))
+                    typ = el_cfg.get('__type__')
+                    if typ not in cls._TYPES:
+                        wrong_name('type', (group, el, '__type__'))
+                    if el_cfg.get('__fork__', 'share') not in (
+                        cls._FORK_POLICIES
                     ):
-                        wrong('attr', (group, el, k))
-                    if k == '__type__' and v not in cls._TYPES:
-                        wrong('type', (group, el, k))
+                        wrong_name('fork policy', (group, el, '__fork__'))
+                    size = el_cfg.get('__pool_size__', 1)
+                    if not isinstance(size, int) or size < 1:
+                        wrong('{0!r} has a wrong pool size {1!r}!',
+                              ':'.join((group, el)), size)
+                    realization = el_cfg.get('__realization__', '')
+                    if not isinstance(realization, _STRING_TYPES):
+                        wrong('{0!r} has a wrong realization {1!r}!',
+                              ':'.join((group, el)), realization)
+                    check_deps(group, el, el_cfg)
+        except _TooManyErrors:
+            pass
         return errors
 
 
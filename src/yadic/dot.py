@@ -3,8 +3,10 @@
 from __future__ import print_function
 
 import json
+import sys
 from collections import deque
 from optparse import OptionParser
+from xml.sax.saxutils import escape, quoteattr
 
 from yadic.container import Container
 
@@ -21,40 +23,61 @@ def dot(container, include, exclude):
     :type exclude: dict
     """
     assert isinstance(include, dict) and isinstance(exclude, dict)
-    data = container._config
-
-    def make_filter(data, consider_from=False):
-        groupset = set(g for (g, es) in data.items() if not es)
-        nodeset = set(_key_pairs(data))
-
-        def inner(pair):
-            from_node, node = pair
-            return (from_node and consider_from) or (
-                node[0] in groupset or node in nodeset
-            )
-        return inner
-
-    def branch(node):
-        grp, ent = node
-        result = []
-        for dep_name, val in data[grp][ent].items():
-            if not dep_name.startswith('$') and not dep_name.startswith('__'):
-                first, rest = val
-                if first is None:
-                    deps = rest
-                else:
-                    deps = [val]
-                result.extend(deps)
-        return result
-
-    initial = _key_pairs(data)
-
-    return _render_digraph(_arc_list(
-        initial=initial,
-        branch_it=branch,
-        include=make_filter(include, True) if include else (lambda _: True),
-        exclude=make_filter(exclude)
-    ))
+    return '\n'.join(render_dot(walk(container, include, exclude)))
+
+
+def walk(container, include=None, exclude=None, roots=None, depth=None):
+    """Yields the pairs (from_node, node) of container's hierarchy
+    (breadth-first): (None, node) for each initial node
+    and then each edge (only once)
+
+    :param container: container object
+    :type container: yadic.container.Container
+    :param include: include filter {group: set of entities}:
+                    the matching nodes and all their deps are walked
+    :type include: dict
+    :param exclude: exclude filter {group: set of entities}:
+                    the matching nodes are skipped
+    :type exclude: dict
+    :param roots: initial nodes [(group, entity),...] (all by default)
+    :type roots: iterable
+    :param depth: max distance of the walked deps from the initial nodes
+    :type depth: int
+    """
+    included = _matcher(include) if include else (lambda _: True)
+    excluded = _matcher(exclude or {})
+
+    seen = set()
+    nodes = deque()
+    for node in (_key_pairs(container._config) if roots is None else roots):
+        if node not in seen and included(node) and not excluded(node):
+            seen.add(node)
+            nodes.append((node, 0))
+            yield (None, node)
+    while nodes:
+        node, distance = nodes.popleft()
+        if depth is not None and distance >= depth:
+            continue
+        for child in sorted(container.dependencies(
+            node[0], node[1], transitive=False
+        )):
+            if not excluded(child):
+                yield (node, child)
+                if child not in seen:
+                    seen.add(child)
+                    nodes.append((child, distance + 1))
+
+
+def _matcher(data):
+    """Returns the predicate, which checks the node (group, entity)
+    against the filter {group: set of entities},
+    where the empty set matches all the entities of the group"""
+    groupset = set(g for (g, es) in data.items() if not es)
+    nodeset = set(_key_pairs(data))
+
+    def inner(node):
+        return node[0] in groupset or node in nodeset
+    return inner
 
 
 def _key_pairs(data):
@@ -67,31 +90,96 @@ def _key_pairs(data):
     return ((k1, k2) for k1, lvl2 in data.items() for k2 in lvl2)
 
 
-def _arc_list(initial, branch_it, include, exclude):
-    result = []
-    populated = set()
-    nodes = deque((None, n) for n in initial)
-    while nodes:
-        _, node = pair = nodes.popleft()
-        if include(pair) and not exclude(pair):
-            result.append(pair)
-            if node not in populated:
-                populated.add(node)
-                nodes.extend((node, child) for child in branch_it(node))
-    return result
+def _name(node):
+    return '{}:{}'.format(*node)
 
 
-def _render_digraph(pairs):
-    """Renders paris of nodes to .dot-file with directional graph.
+def render_dot(pairs, clusters=False):
+    """Yields the lines of the .dot-file with directional graph.
+
+    :param pairs: pairs of nodes (see walk)
+    :type pairs: iterable
+    :param clusters: put the nodes of each group into the cluster
+    :type clusters: bool
     """
-    out = ['digraph container {']
+    groups = {}
+    yield 'digraph container {'
     for frm, to in pairs:
-        out.append(
+        yield (
             '\t' +
             ('"{}:{}" -> '.format(*frm) if frm else '') +
             '"{}:{}";'.format(*to))
-    out.append("}")
-    return '\n'.join(out)
+        if clusters:
+            for node in (frm, to) if frm else (to,):
+                groups.setdefault(node[0], set()).add(node)
+    for group in sorted(groups):
+        yield '\tsubgraph "cluster_{}" {{'.format(group)
+        yield '\t\tlabel="{}";'.format(group)
+        for node in sorted(groups[group]):
+            yield '\t\t"{}:{}";'.format(*node)
+        yield '\t}'
+    yield '}'
+
+
+def render_json(pairs):
+    """Yields the lines of the JSON document
+    {"edges": [[from, to],...], "nodes": [{"id": ..., "group": ...},...]}
+
+    :param pairs: pairs of nodes (see walk)
+    :type pairs: iterable
+    """
+    nodes = []
+    seen = set()
+    sep = ''
+    yield '{"edges": ['
+    for frm, to in pairs:
+        for node in (frm, to) if frm else (to,):
+            if node not in seen:
+                seen.add(node)
+                nodes.append(node)
+        if frm:
+            yield sep + json.dumps([_name(frm), _name(to)])
+            sep = ','
+    yield '], "nodes": ['
+    sep = ''
+    for node in nodes:
+        yield sep + json.dumps({'id': _name(node), 'group': node[0]})
+        sep = ','
+    yield ']}'
+
+
+def render_graphml(pairs):
+    """Yields the lines of the GraphML document
+
+    :param pairs: pairs of nodes (see walk)
+    :type pairs: iterable
+    """
+    seen = set()
+    yield '<?xml version="1.0" encoding="UTF-8"?>'
+    yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">'
+    yield (
+        '  <key id="group" for="node" attr.name="group"'
+        ' attr.type="string"/>')
+    yield '  <graph id="container" edgedefault="directed">'
+    for frm, to in pairs:
+        for node in (frm, to) if frm else (to,):
+            if node not in seen:
+                seen.add(node)
+                yield (
+                    '    <node id={}><data key="group">{}</data></node>'
+                ).format(quoteattr(_name(node)), escape(node[0]))
+        if frm:
+            yield '    <edge source={} target={}/>'.format(
+                quoteattr(_name(frm)), quoteattr(_name(to)))
+    yield '  </graph>'
+    yield '</graphml>'
+
+
+_RENDERERS = {
+    'dot': render_dot,
+    'json': render_json,
+    'graphml': render_graphml,
+}
 
 
 def _parse_filter(filter_string):
@@ -116,18 +204,56 @@ def _main():
         '-i', '--include', dest='include', metavar='FILTER', default=None)
     parser.add_option(
         '-x', '--exclude', dest='exclude', metavar='FILTER', default=None)
+    parser.add_option(
+        '-r', '--root', dest='roots', metavar='GROUP:NAME',
+        action='append', default=None,
+        help='initial entity (could be repeated)')
+    parser.add_option(
+        '-d', '--depth', dest='depth', type='int', default=None,
+        help='max depth of the deps of the initial entities')
+    parser.add_option(
+        '-c', '--clusters', dest='clusters', action='store_true',
+        default=False, help='cluster the entities by group (dot only)')
+    parser.add_option(
+        '-f', '--format', dest='format', type='choice',
+        choices=sorted(_RENDERERS), default='dot',
+        help='output format: dot (default), json or graphml')
+    parser.add_option(
+        '-o', '--output', dest='output', metavar='FILE', default=None,
+        help='output file (stdout by default)')
     options, args = parser.parse_args()
 
     if not args:
         parser.error('config file must be provided')
+    if any(':' not in root for root in options.roots or ()):
+        parser.error('root must be in form GROUP:NAME')
+    conf_file, = args
+    with open(conf_file) as f:
+        container = Container(json.load(f))
+    roots = options.roots and [
+        tuple(root.split(':', 1)) for root in options.roots]
+    for group, name in roots or ():
+        if name not in container._config.get(group, ()):
+            parser.error('{}:{} is not configured'.format(group, name))
+    pairs = walk(
+        container,
+        include=_parse_filter(options.include or ''),
+        exclude=_parse_filter(options.exclude or ''),
+        roots=roots,
+        depth=options.depth,
+    )
+    if options.format == 'dot':
+        lines = render_dot(pairs, options.clusters)
     else:
-        conf_file, = args
-        with open(conf_file) as f:
-            print(dot(
-                container=Container(json.load(f)),
-                include=_parse_filter(options.include or ''),
-                exclude=_parse_filter(options.exclude or '')
-            ))
+        lines = _RENDERERS[options.format](pairs)
+
+    out = open(options.output, 'w') if options.output else sys.stdout
+    try:
+        for line in lines:
+            out.write(line + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+# coding: utf-8
+"""Dependency graph of the (normalized) container configuration"""
+
+
+def dependencies(blueprint):
+    """Returns the list of pairs (group, entity),
+    which the normalized blueprint depends on
+    :param blueprint: normalized entity configuration
+    :type blueprint: dict"""
+    result = []
+    for dep_name, val in blueprint.items():
+        if not dep_name.startswith('$') and not dep_name.startswith('_'):
+            first, rest = val
+            if first is None:
+                result.extend(rest)
+            else:
+                result.append(val)
+    return result
+
+
+def build(config):
+    """Returns the graph {(group, entity): ((group, entity),...)}
+    :param config: normalized configuration
+    :type config: dict"""
+    return dict(
+        ((grp, ent), tuple(dependencies(blueprint)))
+        for grp, ents in config.items()
+        for ent, blueprint in ents.items()
+    )
+
+
+def levels(graph, roots=None):
+    """Splits the nodes, reachable from the roots (all nodes by default),
+    into the levels: the nodes of each level depend only
+    on the nodes of the previous levels.
+    Raises ValueError for the cyclic dependencies
+    :param graph: dependency graph
+    :type graph: dict
+    :param roots: initial nodes
+    :type roots: iterable"""
+    depth = {}
+    for root in (graph if roots is None else roots):
+        if root in depth:
+            continue
+        path = [root]
+        on_path = set(path)
+        stack = [iter(graph.get(root, ()))]
+        while stack:
+            for node in stack[-1]:
+                if node in depth:
+                    continue
+                if node in on_path:
+                    cycle = path[path.index(node):] + [node]
+                    raise ValueError('Cyclic dependency: {}'.format(
+                        ' -> '.join('{}:{}'.format(*n) for n in cycle)))
+                path.append(node)
+                on_path.add(node)
+                stack.append(iter(graph.get(node, ())))
+                break
+            else:
+                # all the deps are visited
+                stack.pop()
+                node = path.pop()
+                on_path.discard(node)
+                depth[node] = 1 + max(
+                    [depth[n] for n in graph.get(node, ())] or [-1])
+    result = [[] for _ in range(1 + max(list(depth.values()) or [-1]))]
+    for node, lvl in depth.items():
+        result[lvl].append(node)
+    return result
+
+
+def reverse(graph):
+    """Returns the reversed graph {node: (dependent nodes)}
+    :param graph: dependency graph
+    :type graph: dict"""
+    result = dict((node, []) for node in graph)
+    for node, deps in graph.items():
+        for dep in deps:
+            result.setdefault(dep, []).append(node)
+    return dict((node, tuple(nodes)) for node, nodes in result.items())
+
+
+def unknown(graph):
+    """Returns the list of the pairs (node, dep),
+    where the dep isn't the node of the graph
+    :param graph: dependency graph
+    :type graph: dict"""
+    return [
+        (node, dep)
+        for node, deps in graph.items()
+        for dep in deps
+        if dep not in graph
+    ]
+
+
+def closure(graph, roots):
+    """Returns the set of the nodes, reachable from the roots
+    (including the roots themselves)
+    :param graph: dependency graph
+    :type graph: dict
+    :param roots: initial nodes
+    :type roots: iterable"""
+    result = set()
+    nodes = list(roots)
+    while nodes:
+        node = nodes.pop()
+        if node not in result:
+            result.add(node)
+            nodes.extend(graph.get(node, ()))
+    return result
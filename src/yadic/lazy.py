@@ -0,0 +1,102 @@
+# coding: utf-8
+"""Lazy dependencies"""
+
+import threading
+
+_MISSING = object()
+
+
+class LazyProxy(object):
+    """Transparent proxy, which builds the target object
+    on the first use and then delegates everything to it"""
+
+    __slots__ = ('_yadic_factory', '_yadic_target', '_yadic_lock')
+
+    def __init__(self, factory):
+        """:param factory: zero-argument callable, building the target
+        :type factory: callable"""
+        object.__setattr__(self, '_yadic_factory', factory)
+        object.__setattr__(self, '_yadic_target', _MISSING)
+        object.__setattr__(self, '_yadic_lock', threading.Lock())
+
+    def _yadic_get(self):
+        target = object.__getattribute__(self, '_yadic_target')
+        if target is _MISSING:
+            with object.__getattribute__(self, '_yadic_lock'):
+                target = object.__getattribute__(self, '_yadic_target')
+                if target is _MISSING:
+                    target = object.__getattribute__(
+                        self, '_yadic_factory')()
+                    object.__setattr__(self, '_yadic_target', target)
+        return target
+
+    @property
+    def __class__(self):
+        # makes the "isinstance" work
+        return self._yadic_get().__class__
+
+    def __getattr__(self, name):
+        return getattr(self._yadic_get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._yadic_get(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._yadic_get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._yadic_get()(*args, **kwargs)
+
+    def __repr__(self):
+        return repr(self._yadic_get())
+
+    def __str__(self):
+        return str(self._yadic_get())
+
+    def __bool__(self):
+        return bool(self._yadic_get())
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        return len(self._yadic_get())
+
+    def __iter__(self):
+        return iter(self._yadic_get())
+
+    def __contains__(self, item):
+        return item in self._yadic_get()
+
+    def __getitem__(self, key):
+        return self._yadic_get()[key]
+
+    def __setitem__(self, key, value):
+        self._yadic_get()[key] = value
+
+    def __delitem__(self, key):
+        del self._yadic_get()[key]
+
+    def __eq__(self, other):
+        return self._yadic_get() == other
+
+    def __ne__(self, other):
+        return self._yadic_get() != other
+
+    def __hash__(self):
+        return hash(self._yadic_get())
+
+    def __enter__(self):
+        return self._yadic_get().__enter__()
+
+    def __exit__(self, *args):
+        return self._yadic_get().__exit__(*args)
+
+
+def provider(get, first, rest):
+    """Returns the zero-argument callable, which gets the dependency
+    in the normalized form (group, entity) or (None, ((group, entity),...))
+    :param get: function (group, entity) -> instance
+    :type get: callable"""
+    if first is None:
+        return lambda: tuple(get(g, e) for (g, e) in rest)
+    return lambda: get(first, rest)
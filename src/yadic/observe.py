@@ -0,0 +1,110 @@
+# coding: utf-8
+"""Observers of the entity resolution"""
+
+import threading
+import time
+
+try:
+    _clock = time.perf_counter
+except AttributeError:  # Python 2
+    _clock = time.time
+
+
+class Observer(object):
+    """Base observer of the container (all hooks do nothing).
+    Only the building of the instances is reported,
+    the cached (singleton, static etc) ones are just returned"""
+
+    def on_resolve_start(self, key):
+        """Building of the entity (with its deps) is started
+        :param key: (group, name)"""
+
+    def on_resolve_end(self, key, instance):
+        """Entity is built
+        :param key: (group, name)
+        :param instance: built instance"""
+
+    def on_import(self, key, name, seconds):
+        """Realization of the entity is imported
+        :param key: (group, name)
+        :param name: full name of the realization
+        :param seconds: import time"""
+
+    def on_singleton_created(self, key, instance):
+        """Singleton is built and cached
+        :param key: (group, name)
+        :param instance: built instance"""
+
+    def on_error(self, key, exc):
+        """Building of the entity is failed. Called for the failed
+        entity and then for each of the entities, being built
+        :param key: (group, name)
+        :param exc: exception"""
+
+
+class MetricsCollector(Observer):
+    """Aggregates the per-entity metrics:
+    calls - number of the built instances,
+    cumulative - building time (including the deps),
+    self_time - building time without the deps and imports,
+    imports/import_time - number and time of the imports,
+    errors - number of the failures"""
+
+    FIELDS = ('calls', 'cumulative', 'self_time', 'imports', 'import_time',
+              'errors')
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # {"group:name": {field: value}}
+        self.stats = {}
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    def _add(self, key, **values):
+        name = '{}:{}'.format(*key)
+        with self._lock:
+            try:
+                stats = self.stats[name]
+            except KeyError:
+                stats = self.stats[name] = dict.fromkeys(self.FIELDS, 0)
+            for field, value in values.items():
+                stats[field] += value
+
+    def on_resolve_start(self, key):
+        # frame: [key, start time, time of the children]
+        self._stack().append([key, _clock(), 0.0])
+
+    def on_resolve_end(self, key, instance):
+        self._pop(key, calls=1)
+
+    def on_error(self, key, exc):
+        self._pop(key, errors=1)
+
+    def _pop(self, key, **values):
+        stack = self._stack()
+        if not stack or stack[-1][0] != key:
+            return
+        elapsed = _clock() - stack[-1][1]
+        self_time = elapsed - stack[-1][2]
+        self._frame_done(stack, self_time)
+        stack.pop()
+        if stack:
+            stack[-1][2] += elapsed
+        self._add(key, cumulative=elapsed, self_time=self_time, **values)
+
+    def _frame_done(self, stack, self_time):
+        """Called for the completed (top) frame of the stack
+        before it will be popped"""
+
+    def on_import(self, key, name, seconds):
+        stack = self._stack()
+        if stack:
+            # import isn't the part of the building itself
+            stack[-1][2] += seconds
+        self._add(key, imports=1, import_time=seconds)
@@ -0,0 +1,100 @@
+# coding: utf-8
+"""Pooled lifetime of the entities"""
+
+import threading
+import time
+
+from yadic.scope import dispose
+
+
+class Pool(object):
+    """Bounded thread-safe pool of the reusable instances.
+    Instances are created on demand (up to the size of the pool),
+    when the pool is exhausted, the acquiring thread waits
+    for some instance to be released"""
+
+    def __init__(self, factory, size):
+        """:param factory: zero-argument callable, creating the instance
+        :type factory: callable
+        :param size: maximal number of the instances
+        :type size: int"""
+        self._factory = factory
+        self.size = size
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition(threading.Lock())
+        # acquisitions of the idle instances
+        self.hits = 0
+        # acquisitions, which had to wait for the release
+        self.waits = 0
+        self.creations = 0
+
+    def acquire(self, timeout=None):
+        """Returns the instance from the pool (creates it, if needed)
+        :param timeout: maximal time (in seconds) to wait for the instance
+        :type timeout: float"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            waited = False
+            while not self._idle and self._created >= self.size:
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise RuntimeError(
+                            'Pool is exhausted ({} instances)!'.format(
+                                self.size))
+                    self._cond.wait(remaining)
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self._created += 1
+            self.creations += 1
+        try:
+            return self._factory()
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, instance):
+        """Returns the instance into the pool
+        :param instance: acquired instance"""
+        with self._cond:
+            self._idle.append(instance)
+            self._cond.notify()
+
+    def discard(self, instance):
+        """Disposes the (broken) acquired instance instead of returning
+        it into the pool, so the new one will be created on demand
+        :param instance: acquired instance"""
+        self._forget()
+        dispose(instance)
+
+    def _forget(self):
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def close(self):
+        """Disposes the idle instances"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for instance in reversed(idle):
+            dispose(instance)
+
+    def stats(self):
+        """Returns the dict of the pool statistics"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'waits': self.waits,
+                'creations': self.creations,
+            }
@@ -0,0 +1,130 @@
+# coding:utf-8
+"""Resolution profiler.
+
+Resolves the entity repeatedly and prints the table of the top entities
+by the building time. Timed resolution tree can be saved as the
+"collapsed stacks" (suitable for the flamegraph tools):
+
+    python -m yadic.profile config.json group:name -n 100 -o out.folded
+    flamegraph.pl out.folded > out.svg
+"""
+
+from __future__ import print_function
+
+import json
+import sys
+from optparse import OptionParser
+
+from yadic.container import Container
+from yadic.observe import MetricsCollector
+
+
+class Profiler(MetricsCollector):
+    """Collects the metrics and the timed resolution tree"""
+
+    def __init__(self):
+        super(Profiler, self).__init__()
+        # {"grp:a;grp:b": seconds}
+        self.stacks = {}
+
+    def _path(self, stack):
+        return ';'.join('{}:{}'.format(*f[0]) for f in stack)
+
+    def _collapse(self, path, seconds):
+        with self._lock:
+            self.stacks[path] = self.stacks.get(path, 0) + seconds
+
+    def _frame_done(self, stack, self_time):
+        self._collapse(self._path(stack), self_time)
+
+    def on_import(self, key, name, seconds):
+        super(Profiler, self).on_import(key, name, seconds)
+        # imports are made before the building of the entity
+        path = self._path(self._stack())
+        self._collapse(
+            (path + ';' if path else '') + '{}:{} [import {}]'.format(
+                key[0], key[1], name),
+            seconds)
+
+    def collapsed(self):
+        """Returns the lines of the "collapsed stacks" (in microseconds)
+        """
+        return [
+            '{} {}'.format(path, int(round(seconds * 1e6)))
+            for path, seconds in sorted(self.stacks.items())
+        ]
+
+    def table(self, top=None):
+        """Returns the lines of the table of the top entities
+        by the self building time"""
+        rows = sorted(
+            self.stats.items(),
+            key=lambda item: -item[1]['self_time'])[:top]
+        fmt = '{:<40} {:>8} {:>12} {:>12} {:>12} {:>6}'
+        lines = [fmt.format(
+            'entity', 'calls', 'self, ms', 'cumul., ms', 'import, ms',
+            'errors')]
+        for name, stats in rows:
+            lines.append(fmt.format(
+                name, stats['calls'],
+                '{:.3f}'.format(stats['self_time'] * 1e3),
+                '{:.3f}'.format(stats['cumulative'] * 1e3),
+                '{:.3f}'.format(stats['import_time'] * 1e3),
+                stats['errors']))
+        return lines
+
+
+def profile(container, group, name, number=1):
+    """Resolves the entity "number" times and returns the profiler
+    :param container: container object
+    :type container: yadic.container.Container
+    :param group: entity group
+    :type group: str
+    :param name: entity name
+    :type name: str
+    :param number: number of the resolutions
+    :type number: int
+    """
+    profiler = Profiler()
+    container.add_observer(profiler)
+    try:
+        for _ in range(number):
+            container.get(group, name)
+    finally:
+        container.remove_observer(profiler)
+    return profiler
+
+
+def _main():
+    parser = OptionParser(
+        usage='usage: %prog [options] <CONFIG.JSON> <GROUP:NAME>')
+    parser.add_option(
+        '-n', '--number', dest='number', type='int', default=1,
+        help='number of the resolutions')
+    parser.add_option(
+        '-t', '--top', dest='top', type='int', default=20,
+        help='number of the entities in the table')
+    parser.add_option(
+        '-o', '--output', dest='output', metavar='FILE', default=None,
+        help='file for the collapsed stacks ("-" for stdout)')
+    options, args = parser.parse_args()
+
+    if len(args) != 2 or ':' not in args[1]:
+        parser.error('config file and entity must be provided')
+    conf_file, entity = args
+    with open(conf_file) as f:
+        container = Container(json.load(f))
+    group, name = entity.split(':', 1)
+
+    profiler = profile(container, group, name, options.number)
+    if options.output == '-':
+        print('\n'.join(profiler.collapsed()))
+    else:
+        if options.output:
+            with open(options.output, 'w') as f:
+                f.write('\n'.join(profiler.collapsed()) + '\n')
+        print('\n'.join(profiler.table(options.top)))
+
+
+if __name__ == '__main__':
+    sys.exit(_main())
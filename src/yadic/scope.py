@@ -0,0 +1,181 @@
+# coding: utf-8
+"""Scoped lifetimes of the entities"""
+
+import threading
+import time
+
+from yadic.util import default_workers
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
+
+
+def dispose(instance):
+    """Disposes the instance, if it is disposable
+    (has the "close" or is a context manager)
+    :param instance: instance of the entity"""
+    close = getattr(instance, 'close', None)
+    if callable(close):
+        close()
+        return
+    exit_ = getattr(instance, '__exit__', None)
+    if callable(exit_):
+        exit_(None, None, None)
+
+
+def timeout_error(key, timeout):
+    """Returns the error for the instance, not disposed in time
+    :param key: (group, name)
+    :type key: tuple"""
+    return RuntimeError('{}:{} was not disposed in {} seconds!'.format(
+        key[0], key[1], timeout))
+
+
+def dispose_parallel(instances, timeout=None, max_workers=None):
+    """Disposes the instances by the bounded set of the daemon worker
+    threads. The timeout is counted for each instance from the start
+    of its disposal, the worker, stuck with the instance, is abandoned
+    and replaced by the new one.
+    Returns the dict {key: exception} for the failed ones
+    :param instances: instances to be disposed {key: instance}
+    :type instances: dict
+    :param timeout: time (in seconds) to wait for each instance
+    :type timeout: float
+    :param max_workers: number of the threads (see default_workers)
+    :type max_workers: int"""
+    errors = {}
+    if len(instances) == 1 and timeout is None:
+        for key, instance in instances.items():
+            try:
+                dispose(instance)
+            except Exception as e:
+                errors[key] = e
+        return errors
+
+    queue = sorted(instances.items(), reverse=True)
+    # {key: start time} of the instances being disposed
+    started = {}
+    finished = set()
+    cond = threading.Condition()
+
+    def work():
+        while True:
+            with cond:
+                if not queue:
+                    return
+                key, instance = queue.pop()
+                started[key] = time.time()
+                cond.notify()  # supervisor waits for its deadline
+            try:
+                dispose(instance)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            with cond:
+                if key in finished:  # timed out, the worker is abandoned
+                    return
+                finished.add(key)
+                if error is not None:
+                    errors[key] = error
+                cond.notify()
+
+    def spawn():
+        thread = threading.Thread(target=work, name='yadic-dispose')
+        # hung disposal must not block the interpreter exit
+        thread.daemon = True
+        thread.start()
+
+    with cond:
+        for _ in range(min(len(queue), max_workers or default_workers())):
+            spawn()
+        while len(finished) < len(instances):
+            wait = None
+            if timeout is not None:
+                now = time.time()
+                for key, start in list(started.items()):
+                    if key in finished:
+                        del started[key]
+                    elif now - start >= timeout:
+                        del started[key]
+                        finished.add(key)
+                        errors[key] = timeout_error(key, timeout)
+                        if queue:
+                            spawn()
+                if len(finished) == len(instances):
+                    break
+                if started:
+                    wait = max(0, min(started.values()) + timeout - now)
+            cond.wait(wait)
+    return errors
+
+
+class Local(object):
+    """Context-local value (thread-local one for Python < 3.7)"""
+
+    def __init__(self, default):
+        self._default = default
+        if ContextVar is not None:
+            self._var = ContextVar('yadic', default=default)
+        else:
+            self._var = None
+            self._local = threading.local()
+
+    def get(self):
+        if self._var is not None:
+            return self._var.get()
+        return getattr(self._local, 'value', self._default)
+
+    def set(self, value):
+        if self._var is not None:
+            self._var.set(value)
+        else:
+            self._local.value = value
+
+
+class Scope(object):
+    """Storage of the instances, living while the scope is active"""
+
+    def __init__(self):
+        self._instances = {}
+        self._order = []
+
+    def get(self, key, default=None):
+        return self._instances.get(key, default)
+
+    def __setitem__(self, key, instance):
+        if key not in self._instances:
+            self._order.append(instance)
+        self._instances[key] = instance
+
+    def close(self):
+        """Disposes the instances in the reverse order of the creation"""
+        order, self._order, self._instances = self._order, [], {}
+        error = None
+        for instance in reversed(order):
+            try:
+                dispose(instance)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+
+class ContextCache(object):
+    """Storage of the instances, bound to the current context.
+    The instances are inherited by the contexts, copied from the current
+    one (e.g. by the asyncio tasks), but the instances, created within
+    such context, aren't visible outside it"""
+
+    def __init__(self):
+        self._local = Local({})
+
+    def get(self, key, default=None):
+        return self._local.get().get(key, default)
+
+    def __setitem__(self, key, instance):
+        instances = dict(self._local.get())
+        instances[key] = instance
+        self._local.set(instances)
@@ -0,0 +1,226 @@
+# coding: utf-8
+
+import asyncio
+import time
+
+from yadic.container import Container, EntityConfiguringError
+
+
+def make_container(entities, config):
+    return type('AioContainer', (Container,), {
+        '_get_entity': staticmethod(entities.get)
+    })(config)
+
+
+def test_aget_awaits_coroutines_concurrently():
+    """Tests that coroutine realizations are awaited
+    and sibling deps are built concurrently"""
+
+    running = []
+    peak = []
+
+    async def connect(name):
+        running.append(name)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(name)
+        return name
+
+    cont = make_container({
+        'Connect': connect,
+        'Pair': lambda **kw: kw,
+    }, {
+        'service': {
+            'pair': {
+                '__realization__': 'Pair',
+                'db:conn': 'db',
+                'caches:conn': ['redis', 'memcache'],
+            }
+        },
+        'conn': {
+            '__default__': {'__realization__': 'Connect'},
+            'db': {'$name': 'db'},
+            'redis': {'$name': 'redis'},
+            'memcache': {'$name': 'memcache'},
+        }
+    })
+
+    result = asyncio.run(cont.aget('service', 'pair'))
+    assert result == {'db': 'db', 'caches': ('redis', 'memcache')}
+    assert max(peak) == 3
+
+
+def test_aget_shares_singleton_construction():
+    """Tests that concurrent tasks share the single construction"""
+
+    calls = []
+
+    async def pool():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return []
+
+    cont = make_container({'Pool': pool}, {
+        'db': {'pool': {'__realization__': 'Pool', '__type__': 'singleton'}}
+    })
+
+    async def main():
+        return await asyncio.gather(
+            *[cont.aget('db', 'pool') for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert cont.get('db', 'pool') is results[0]
+    assert not cont._pending
+
+
+def test_aget_error_path():
+    """Tests the error path of the async resolution"""
+
+    async def fail():
+        raise RuntimeError('handshake failed')
+
+    cont = make_container({'Fail': fail, 'Dict': dict}, {
+        'a': {'client': {'__realization__': 'Dict', 'conn:b': 'conn'}},
+        'b': {'conn': {'__realization__': 'Fail', '__type__': 'singleton'}},
+    })
+
+    try:
+        asyncio.run(cont.aget('a', 'client'))
+    except EntityConfiguringError as e:
+        assert e.path == ('a:client', 'b:conn')
+        assert isinstance(e.exc, RuntimeError)
+    else:
+        assert False, 'EntityConfiguringError expected'
+
+
+def test_aget_context_lifetime():
+    """Tests that the "context" instances are bound to the tasks"""
+
+    cont = make_container({'Obj': object}, {
+        'req': {'ctx': {'__realization__': 'Obj', '__type__': 'context'}}
+    })
+
+    async def task():
+        first = await cont.aget('req', 'ctx')
+        assert first is await cont.aget('req', 'ctx')
+        return first
+
+    async def main():
+        return await asyncio.gather(task(), task())
+
+    a, b = asyncio.run(main())
+    assert a is not b
+
+
+def test_aclose_disposes_in_reverse_order():
+    """Tests the asynchronous disposal of the singletones"""
+
+    closed = []
+
+    class Client(object):
+        def __init__(self, name, **deps):
+            self.name = name
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            await asyncio.sleep(0.01)
+            closed.append(self.name)
+
+    class Session(Client):
+        async def close(self):
+            closed.append(self.name)
+
+    cont = make_container({'Client': Client, 'Session': Session}, {
+        'net': {
+            '__default__': {
+                '__realization__': 'Client',
+                '__type__': 'singleton',
+            },
+            'session': {'__realization__': 'Session', '$name': 'session'},
+            'api': {'$name': 'api', 'session:net': 'session'},
+        }
+    })
+    cont.get('net', 'api')
+    asyncio.run(cont.aclose())
+    assert closed == ['api', 'session']
+
+
+def test_aclose_runs_sync_closers_in_threads():
+    """Tests that the sync closers don't block the event loop"""
+
+    class Socket(object):
+        def __init__(self, **kwargs):
+            pass
+
+        def close(self):
+            time.sleep(0.3)
+
+    cont = make_container({'Socket': Socket}, {
+        'net': {
+            '__default__': {
+                '__realization__': 'Socket',
+                '__type__': 'singleton',
+            },
+            'a': {},
+            'b': {},
+        }
+    })
+    cont.get('net', 'a')
+    cont.get('net', 'b')
+    start = time.time()
+    try:
+        asyncio.run(cont.aclose(timeout=0.1))
+    except RuntimeError as e:
+        assert 'was not disposed' in str(e)
+    else:
+        assert False, 'Hung disposal must be reported'
+    assert time.time() - start < 0.25
+
+
+def test_aget_shares_cached_instances_between_siblings():
+    """Tests that the concurrent sibling deps share the "scoped"
+    and the "context" instances"""
+
+    built = []
+
+    async def session(**kwargs):
+        built.append(kwargs)
+        await asyncio.sleep(0.01)
+        return object()
+
+    cont = make_container({
+        'Session': session,
+        'Pair': lambda **kw: kw,
+    }, {
+        'db': {
+            'sess': {'__realization__': 'Session', '__type__': 'scoped'},
+        },
+        'req': {
+            'ctx': {'__realization__': 'Session', '__type__': 'context'},
+            'a': {'__realization__': 'Pair', 'ctx:req': 'ctx'},
+            'b': {'__realization__': 'Pair', 'ctx:req': 'ctx'},
+        },
+        'uow': {
+            'scoped': {
+                '__realization__': 'Pair', 'a:db': 'sess', 'b:db': 'sess'},
+            'context': {
+                '__realization__': 'Pair', 'a:req': 'a', 'b:req': 'b'},
+        },
+    })
+
+    async def main():
+        with cont.scope():
+            pair = await cont.aget('uow', 'scoped')
+            assert pair['a'] is pair['b']
+        pair = await cont.aget('uow', 'context')
+        assert pair['a']['ctx'] is pair['b']['ctx']
+        assert pair['a']['ctx'] is cont.get('req', 'ctx')
+        assert (await cont.aget('uow', 'context'))['a']['ctx'] is (
+            pair['a']['ctx'])
+
+    asyncio.run(main())
+    assert len(built) == 2
@@ -1,9 +1,14 @@
 # coding:utf-8
 
-from yadic.util import merge
+import sys
+import threading
+import time
+
+from yadic.scope import dispose_parallel
+from yadic.util import default_workers, merge
 from yadic.container import (
-    Injectable, Container,
-    _merge_upto_lvl2_then_take_other
+    Injectable, Container, EntityConfiguringError, ThreadPoolExecutor,
+    _merge_upto_lvl2_then_take_other, _parallel_map
 )
 
 
@@ -62,6 +67,34 @@ def test_config_validation():
     assert Container.collect_errors({'grp': {'name': {'__type__': 'asdf'}}})
     assert Container.collect_errors(
         {'grp': {'name': {'__realizationN__': 'asdf'}}})
+    assert Container.collect_errors(
+        {'grp': {'name': {'__realization__': 'x.Y', 'a:b:c': 'd'}}})
+
+
+def test_config_cross_validation():
+    """Tests the validation of the references and the realizations"""
+
+    cfg = {
+        'grp': {
+            '__default__': {'__realization__': 'x.Y', 'dep:other': 'a'},
+            'x': {},
+            'y': {'dep:other': 'c', 'deps:other': ['a', 'b']},
+        },
+        'other': {
+            'a': {'__realization__': 'x.A'},
+            'z': {'__type__': 'static', 'bad:grp': 42},
+        }
+    }
+    assert sorted(Container.collect_errors(cfg)) == [
+        "'grp:y' depends on unknown 'other:b'!",
+        "'grp:y' depends on unknown 'other:c'!",
+        "'other:z' has no realization!",
+        "'other:z:bad:grp' has a wrong dependency 42!",
+    ]
+    assert len(Container.collect_errors(cfg, max_errors=2)) == 2
+    assert Container.collect_errors(
+        {'grp': {'y': {'dep:other': 'b'}}},
+        known={'grp': ['y'], 'other': ['b']}) == []
 
 
 def test_static_elements():
@@ -307,3 +340,1027 @@ def test_complex_example():
 
     assert str(cont.get('vehicle', truck)) == (
         "The vehicle, driven by wheel, which powered by diesel on Gasoline")
+
+
+def test_resolution_plans():
+    """Tests the compilation and caching of the resolution plans"""
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Sum': lambda x, y: x + y}.get)}
+    )({
+        'results': {
+            'sum_x_y': {
+                '__realization__': 'Sum',
+                '$x': 20,
+                'y:results': 'y',
+            },
+            'y': {
+                '__realization__': 'Sum',
+                '$x': 1,
+                '$y': 1,
+            }
+        }
+    })
+    assert not cont._plans
+    assert cont.get('results', 'sum_x_y') == 22
+    plan = cont._plans[('results', 'sum_x_y')]
+    assert plan.fullname == 'results:sum_x_y'
+    assert plan.kwargs == {'x': 20}
+    assert plan.deps == (('y', 'results', 'y'),)
+    assert cont.get('results', 'sum_x_y') == 22
+    assert cont._plans[('results', 'sum_x_y')] is plan
+
+    try:
+        cont.get('results', 'unknown')
+    except ValueError as e:
+        assert 'results:unknown' in str(e)
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_generated_factories():
+    """Tests the factories, generated in the "compile" mode"""
+
+    calls = []
+
+    def pair(**kwargs):
+        calls.append(kwargs)
+        return kwargs
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({
+            'Pair': pair,
+            'List': list,
+            'X': 42,
+            'Fail': lambda: 1 / 0,
+        }.get)}
+    )({
+        'results': {
+            'pair': {
+                '__realization__': 'Pair',
+                '$x': 1,
+                'y:args': 'x',
+                'lst:args': 'lst',
+                'many:args': ['x', 'lst'],
+                'none:args': [],
+            },
+            'broken': {
+                '__realization__': 'Pair',
+                'dep:args': 'fail',
+            },
+            'keywords': {
+                '__realization__': 'Pair',
+                '$class': 'btn',
+                '$y': 1,
+                'from:args': 'x',
+            },
+        },
+        'args': {
+            'x': {'__realization__': 'X', '__type__': 'static'},
+            'lst': {'__realization__': 'List', '__type__': 'singleton'},
+            'fail': {'__realization__': 'Fail'},
+        }
+    }, compile=True)
+
+    lst = cont.get('args', 'lst')
+    lst.append(1)
+    make = cont.factory('results', 'pair')
+    assert cont.factory('results', 'pair') is make
+    result = make()
+    assert result == {
+        'x': 1, 'y': 42, 'lst': lst, 'many': (42, lst), 'none': ()}
+    assert make() is not result
+    assert make()['lst'] is lst
+    assert cont.factory('args', 'x')() == 42
+    assert cont.factory('results', 'keywords')() == {
+        'class': 'btn', 'y': 1, 'from': 42}
+
+    try:
+        cont.factory('results', 'broken')()
+    except EntityConfiguringError as e:
+        assert e.path == ('results:broken', 'args:fail')
+        assert isinstance(e.exc, ZeroDivisionError)
+    else:
+        assert False, 'EntityConfiguringError expected'
+
+
+def test_threadsafe_singletones():
+    """Tests that the singleton is built once by the concurrent threads"""
+
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.01)
+        return object()
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Slow': slow}.get)}
+    )({
+        'pool': {
+            'db': {'__realization__': 'Slow', '__type__': 'singleton'}
+        }
+    })
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cont.get('pool', 'db')))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(r is results[0] for r in results)
+
+
+def test_falsy_cached_values():
+    """Tests that falsy singletones and realizations are cached too"""
+
+    imports = []
+    calls = []
+
+    def get_entity(name):
+        imports.append(name)
+        return {'Registry': lambda: calls.append(1) or {}, 'ZERO': 0}[name]
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(get_entity)}
+    )({
+        'registry': {
+            'plugins': {
+                '__realization__': 'Registry',
+                '__type__': 'singleton'
+            }
+        },
+        'const': {
+            'zero': {'__realization__': 'ZERO', '__type__': 'static'}
+        }
+    }, compile=True)
+
+    registry = cont.get('registry', 'plugins')
+    assert registry == {}
+    assert cont.get('registry', 'plugins') is registry
+    assert cont.factory('registry', 'plugins')() is registry
+    assert len(calls) == 1
+
+    assert cont.get('const', 'zero') == 0
+    assert list(cont.itergroup('const')) == [
+        ('zero', {'__realization__': 'ZERO', '__type__': 'static'}, 0)]
+    assert sorted(imports) == ['Registry', 'ZERO']
+
+
+def test_warm_up():
+    """Tests the parallel warm up of the singletones"""
+
+    built = []
+    lock = threading.Lock()
+
+    def slow(**deps):
+        time.sleep(0.05)
+        with lock:
+            built.append(deps)
+        return deps
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Slow': slow}.get)})
+
+    def config():
+        return {
+            'pool': {
+                '__default__': {
+                    '__realization__': 'Slow',
+                    '__type__': 'singleton'
+                },
+                'db': {'$name': 'db'},
+                'cache': {'$name': 'cache'},
+                'queue': {'$name': 'queue'},
+            },
+            'service': {
+                'api': {
+                    '__realization__': 'Slow',
+                    '__type__': 'singleton',
+                    'pools:pool': ['db', 'cache'],
+                },
+                'handler': {
+                    '__realization__': 'Slow',
+                    'api:service': 'api',
+                }
+            }
+        }
+
+    cont = cls(config())
+    start = time.time()
+    times = cont.warm_up()
+    if ThreadPoolExecutor is not None:
+        assert time.time() - start < 0.15  # 4 * 0.05 when serial
+    assert sorted(times) == [
+        ('pool', 'cache'), ('pool', 'db'), ('pool', 'queue'),
+        ('service', 'api')]
+    assert cont.get('service', 'api') is built[-1]
+    assert built[-1]['pools'] == (
+        cont.get('pool', 'db'), cont.get('pool', 'cache'))
+
+    cont = cls(config())
+    assert sorted(cont.warm_up(['service'], max_workers=1)) == [
+        ('pool', 'cache'), ('pool', 'db'), ('service', 'api')]
+
+    # number of the threads is bounded
+    threads = set()
+
+    def work(_):
+        threads.add(threading.current_thread())
+        time.sleep(0.01)
+
+    _parallel_map(work, range(100))
+    if ThreadPoolExecutor is not None:
+        assert 1 < len(threads) <= default_workers()
+
+
+def test_preload():
+    """Tests the eager and the explicit preloading of the realizations"""
+
+    imported = []
+
+    def get_entity(name):
+        imported.append(name)
+        return dict
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(get_entity)})
+
+    def config():
+        return {
+            'a': {'x': {'__realization__': 'A.x'}},
+            'b': {
+                'y': {'__realization__': 'B.y'},
+                'z': {'__realization__': 'B.z'},
+            },
+        }
+
+    cls(config(), preload='eager')
+    assert sorted(imported) == ['A.x', 'B.y', 'B.z']
+
+    del imported[:]
+    cont = cls(config())
+    assert not imported
+    cont.get('b', 'y')
+    assert sorted(cont.preload(['b'])) == [('b', 'z')]
+    assert sorted(imported) == ['B.y', 'B.z']
+    assert sorted(cont.import_times) == [('b', 'y'), ('b', 'z')]
+
+    try:
+        cls(config(), preload='sometimes')
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_graph_errors():
+    """Tests the detection of the cycles and of the unknown deps"""
+
+    for trusted in (False, True):
+        try:
+            Container({
+                'a': {
+                    'x': {'__realization__': 'A.x', 'y:b': 'y'},
+                },
+                'b': {
+                    'y': {'__realization__': 'B.y', 'x:a': 'x'},
+                },
+            }, trusted=trusted)
+        except ValueError as e:
+            msg = str(e)
+            assert ('Cyclic dependency: a:x -> b:y -> a:x' in msg or
+                    'Cyclic dependency: b:y -> a:x -> b:y' in msg)
+        else:
+            assert False, 'ValueError expected'
+
+    try:
+        Container({
+            'b': {'z': {'__realization__': 'B.z', 'w:a': 'w'}},
+        }, trusted=True)
+    except ValueError as e:
+        assert "'b:z' depends on unknown 'a:w'!" in str(e)
+    else:
+        assert False, 'ValueError expected'
+
+    cont = Container({
+        'a': {'x': {'__realization__': 'A.x', 'y:b': 'y'}},
+        'b': {'y': {'__realization__': 'B.y'}},
+    })
+    assert cont._levels == [[('b', 'y')], [('a', 'x')]]
+
+
+def test_deep_graphs():
+    """Tests the resolution of the graph deeper than the recursion limit"""
+
+    depth = sys.getrecursionlimit() * 2
+
+    def link(nxt=None):
+        return (nxt or 0) + 1
+
+    config = {'chain': dict(
+        ('n{}'.format(i), {
+            '__realization__': 'Link',
+            'nxt:chain': 'n{}'.format(i + 1)
+        })
+        for i in range(depth)
+    )}
+    config['chain']['n{}'.format(depth)] = {
+        '__realization__': 'Link', '__type__': 'singleton'}
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Link': link, 'Fail': None}.get)}
+    )(config)
+    assert cont.get('chain', 'n0') == depth + 1
+    compiled = type(cont)(config, compile=True)
+    assert compiled.factory('chain', 'n0')() == depth + 1
+
+    config['chain']['n{}'.format(depth)]['__realization__'] = 'Fail'
+    cont = type(cont)(config)
+    try:
+        cont.get('chain', 'n0')
+    except EntityConfiguringError as e:
+        assert len(e.path) == depth + 1
+        assert e.path[:2] == ('chain:n0', 'chain:n1')
+        assert isinstance(e.exc, TypeError)
+    else:
+        assert False, 'EntityConfiguringError expected'
+    # locks of the singletones are released
+    lock = cont._get_lock(('chain', 'n{}'.format(depth)))
+    acquired = []
+    t = threading.Thread(target=lambda: acquired.append(lock.acquire(False)))
+    t.start()
+    t.join()
+    assert acquired == [True]
+
+
+def test_scoped_lifetimes():
+    """Tests the "scoped", "thread" and "context" entities"""
+
+    class Session(object):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({
+            'Session': Session,
+            'Pair': lambda **kw: kw,
+        }.get)}
+    )({
+        'db': {
+            'session': {'__realization__': 'Session', '__type__': 'scoped'},
+            'conn': {'__realization__': 'Session', '__type__': 'thread'},
+            'ctx': {'__realization__': 'Session', '__type__': 'context'},
+        },
+        'uow': {
+            'pair': {
+                '__realization__': 'Pair',
+                'a:db': 'session',
+                'b:db': 'session',
+            }
+        }
+    })
+
+    try:
+        cont.get('db', 'session')
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError expected'
+
+    with cont.scope():
+        pair = cont.get('uow', 'pair')
+        assert pair['a'] is pair['b']
+        assert cont.get('db', 'session') is pair['a']
+        with cont.scope():
+            inner = cont.get('db', 'session')
+            assert inner is not pair['a']
+        assert inner.closed
+        assert not pair['a'].closed
+    assert pair['a'].closed
+
+    with cont.scope():
+        assert cont.get('db', 'session') is not pair['a']
+
+    conns = []
+    t = threading.Thread(target=lambda: conns.append(cont.get('db', 'conn')))
+    t.start()
+    t.join()
+    assert cont.get('db', 'conn') is cont.get('db', 'conn')
+    assert cont.get('db', 'conn') is not conns[0]
+
+    assert cont.get('db', 'ctx') is cont.get('db', 'ctx')
+
+    # longer-living entities can't hold the scoped ones
+    for typ in ('singleton', 'thread', 'context'):
+        try:
+            cont.child({'uow': {
+                'holder': {'__realization__': 'Pair', '__type__': typ,
+                           'pair:uow': 'pair'},
+            }})
+        except ValueError as e:
+            assert "'uow:holder' ({}) outlives".format(typ) in str(e)
+        else:
+            assert False, 'ValueError expected'
+    # the same for the thread and the context ones
+    for dep in ('conn', 'ctx'):
+        try:
+            cont.child({'uow': {'holder': {
+                '__realization__': 'Pair', '__type__': 'singleton',
+                'x:db': dep}}})
+        except ValueError as e:
+            assert "'uow:holder' (singleton) outlives" in str(e)
+        else:
+            assert False, 'ValueError expected'
+    cont.child({'uow': {'holder': {
+        '__realization__': 'Pair', '__type__': 'thread', 'x:db': 'ctx'}}})
+    # but the providers are allowed
+    cont.child({'uow': {'holder': {
+        '__realization__': 'Pair', '__type__': 'singleton',
+        '__providers__': ['pair'], 'pair:uow': 'pair'}}})
+
+
+def test_prepared_config_memo():
+    """Tests that the normalization leaves the config untouched
+    and is memoized for the equal configs"""
+
+    def config(**b):
+        return {
+            'grp': {
+                '__default__': {'__realization__': 'x.Y', '$arg': 1},
+                'a': {},
+                'b': dict({'$arg': 2, '$data': (1, 'k')}, **b),
+            }
+        }
+
+    cfg = config()
+    cont1 = Container(cfg)
+    assert cfg == config()
+    cont2 = Container(config())
+    assert cont2._config is cont1._config
+    assert cont2._levels is cont1._levels
+
+    cfg['grp']['b']['$arg'] = 3
+    assert Container(cfg)._config is not cont1._config
+    # True == 1, but the type matters
+    cfg['grp']['b']['$arg'] = True
+    assert Container(cfg)._config['grp']['b']['$arg'] is True
+
+    # mutable values aren't shared between the containers
+    cfg = config(**{'$data': {'k': [1, 2]}})
+    cont3 = Container(cfg)
+    cfg['grp']['b']['$data']['k'].append(3)
+    cont4 = Container(config(**{'$data': {'k': [1, 2]}}))
+    assert cont4._levels is cont3._levels
+    assert cont4._config['grp']['b']['$data'] == {'k': [1, 2]}
+    assert cont3._config['grp']['b']['$data'] == {'k': [1, 2, 3]}
+    # the blueprints without such values are still shared
+    assert cont4._config['grp']['a'] is cont3._config['grp']['a']
+
+    # unhashable values
+    cfg['grp']['b']['$data'] = set([1])
+    assert Container(cfg)._config is not Container(cfg)._config
+
+
+def test_child_containers():
+    """Tests the child containers with the overridden entities"""
+
+    imported = []
+
+    def get_entity(name):
+        imported.append(name)
+        return lambda **kw: kw
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(get_entity)}
+    )({
+        'db': {
+            'pool': {
+                '__realization__': 'Pool',
+                '__type__': 'singleton',
+                '$timeout': 1,
+            }
+        },
+        'cache': {
+            'store': {'__realization__': 'Store', '__type__': 'singleton'}
+        },
+        'service': {
+            'api': {
+                '__realization__': 'Api',
+                '__type__': 'singleton',
+                'pool:db': 'pool',
+                'store:cache': 'store',
+            }
+        }
+    })
+    api = cont.get('service', 'api')
+    del imported[:]
+
+    child = cont.child({'db': {'pool': {'$timeout': 5}}},
+                       share_singletones=True)
+    assert child._config['cache'] is cont._config['cache']
+    assert cont._config['db']['pool']['$timeout'] == 1
+
+    child_api = child.get('service', 'api')
+    assert child_api is not api
+    assert child_api['pool'] == {'timeout': 5}
+    assert child_api['store'] is api['store']
+    # only the overridden realization is imported again
+    assert imported == ['Pool']
+    assert cont.get('service', 'api') is api
+
+    other = cont.child({'cache': {'mem': {'__realization__': 'Mem'}}})
+    assert other.get('service', 'api') is not api
+    assert other.get('cache', 'mem') == {}
+
+    try:
+        cont.child({'db': {'pool': {'loop:service': 'api'}}})
+    except ValueError as e:
+        assert 'Cyclic dependency' in str(e)
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_update():
+    """Tests the incremental reconfiguration"""
+
+    built = []
+
+    def make(**kw):
+        built.append(kw)
+        return kw
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Make': make}.get)}
+    )({
+        'db': {
+            '__default__': {'__realization__': 'Make'},
+            'pool': {'__type__': 'singleton', '$size': 10},
+            'client': {'$timeout': 1, 'pool:db': 'pool'},
+        },
+        'service': {
+            'api': {
+                '__realization__': 'Make',
+                '__type__': 'singleton',
+                'client:db': 'client',
+            }
+        }
+    }, compile=True)
+    api = cont.get('service', 'api')
+    pool = cont.get('db', 'pool')
+    assert cont.factory('service', 'api')() is api
+    del built[:]
+
+    affected = cont.update({'db': {'client': {'$timeout': 5}}})
+    assert affected == set([('db', 'client'), ('service', 'api')])
+    assert cont.get('db', 'pool') is pool
+    new_api = cont.factory('service', 'api')()
+    assert new_api is not api
+    assert new_api['client'] == {'timeout': 5, 'pool': pool}
+    assert len(built) == 2
+
+    # overridden defaults are applied to the whole group
+    affected = cont.update({'db': {'__default__': {'$timeout': 7}}})
+    assert affected == set([
+        ('db', 'client'), ('db', 'pool'), ('service', 'api')])
+    assert cont.get('db', 'client')['timeout'] == 7
+    assert cont.get('db', 'pool')['timeout'] == 7
+    child = cont.child({'db': {'__default__': {'$timeout': 8}}})
+    assert child.get('db', 'client')['timeout'] == 8
+
+    # evicted singletones are disposed
+    class Conn(object):
+        closed = False
+
+        def __init__(self, **kwargs):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Conn': Conn}.get)})({
+            'db': {
+                '__default__': {
+                    '__realization__': 'Conn', '__type__': 'singleton'},
+                'conn': {'$port': 1},
+                'other': {},
+            }
+        })
+    conn = cont.get('db', 'conn')
+    other = cont.get('db', 'other')
+    cont.update({'db': {'conn': {'$port': 2}}})
+    assert conn.closed
+    assert not other.closed
+
+
+def test_bulk_resolution():
+    """Tests the get_many and the get_group"""
+
+    built = []
+
+    def make(**kw):
+        built.append(kw)
+        return kw
+
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Make': make, 'X': 42}.get)}
+    )({
+        'plugin': {
+            '__default__': {
+                '__realization__': 'Make',
+                'settings:conf': 'settings',
+                'helpers:conf': ['loader', 'settings'],
+            },
+            'a': {},
+            'b': {},
+        },
+        'conf': {
+            'settings': {'__realization__': 'Make'},
+            'loader': {'__realization__': 'Make', 'settings:conf': 'settings'},
+            'x': {'__realization__': 'X', '__type__': 'static'},
+        }
+    })
+
+    plugins = cont.get_group('plugin')
+    assert sorted(plugins) == ['a', 'b']
+    # a, b: settings, loader (+ settings), settings
+    assert len(built) == 10
+    assert plugins['a']['settings'] is not plugins['b']['settings']
+
+    del built[:]
+    plugins = cont.get_group('plugin', share=True)
+    assert len(built) == 4
+    settings = plugins['a']['settings']
+    assert plugins['b']['settings'] is settings
+    assert plugins['a']['helpers'] == (
+        {'settings': settings}, settings)
+    assert plugins['b']['helpers'][0]['settings'] is settings
+
+    a, x, settings = cont.get_many(
+        [('plugin', 'a'), ('conf', 'x'), ('conf', 'settings')], share=True)
+    assert x == 42
+    assert a['settings'] is settings
+
+
+def test_snapshots(tmpdir):
+    """Tests the saving and the loading of the snapshots"""
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Dict': dict}.get)})
+    cont = cls({
+        'grp': {
+            '__default__': {'__realization__': 'Dict'},
+            'a': {'$x': 1, 'b:grp': 'b'},
+            'b': {'__type__': 'singleton'},
+        }
+    })
+    path = str(tmpdir.join('snapshot.bin'))
+    cont.save_snapshot(path)
+
+    for use_mmap in (False, True):
+        loaded = cls.from_snapshot(path, use_mmap=use_mmap)
+        assert type(loaded) is cls
+        assert loaded._config == cont._config
+        assert loaded._levels == cont._levels
+        assert loaded.get('grp', 'a') == {'x': 1, 'b': {}}
+
+    with open(path, 'r+b') as f:
+        f.write(b'X')
+    try:
+        cls.from_snapshot(path)
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_fork_policies():
+    """Tests the pre-fork warm up and the post-fork reinitialization"""
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Make': lambda **kw: kw}.get)})
+    cont = cls({
+        'res': {
+            '__default__': {
+                '__realization__': 'Make',
+                '__type__': 'singleton'
+            },
+            'table': {'__fork__': 'share'},
+            'socket': {'__fork__': 'recreate'},
+            'pool': {'__fork__': 'lazy'},
+            'client': {'sock:res': 'socket'},
+            'service': {'pool:res': 'pool'},
+            'conn': {'__type__': 'thread'},
+        }
+    })
+    assert sorted(cont.warm_up()) == [
+        ('res', 'client'), ('res', 'socket'), ('res', 'table')]
+    table = cont.get('res', 'table')
+    socket = cont.get('res', 'socket')
+    client = cont.get('res', 'client')
+
+    conn = cont.get('res', 'conn')
+
+    assert cont.after_fork() == set([('res', 'socket'), ('res', 'client')])
+    assert cont.get('res', 'conn') is not conn
+    assert cont.get('res', 'table') is table
+    assert cont.get('res', 'socket') is not socket
+    assert cont.get('res', 'client') is not client
+
+    assert Container.collect_errors({'res': {'x': {
+        '__realization__': 'x.X', '__fork__': 'sometimes'}}})
+
+
+def test_lazy_deps():
+    """Tests the "~lazy" deps and the providers"""
+
+    built = []
+
+    class PDF(object):
+        def __init__(self):
+            built.append('pdf')
+
+        def render(self):
+            return 'pdf'
+
+    class Renderer(object):
+        def __init__(self, render, fallback=None):
+            self.render = render
+            self.fallback = fallback
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(
+            {'PDF': PDF, 'Renderer': Renderer}.get)})
+    config = {
+        'render': {
+            'pdf': {'__realization__': 'PDF'},
+        },
+        'renderer': {
+            'lazy': {
+                '__realization__': 'Renderer',
+                'render:render': '~pdf',
+            },
+            'provided': {
+                '__realization__': 'Renderer',
+                '__providers__': ['render'],
+                'render:render': 'pdf',
+            },
+        },
+    }
+    for compile_ in (False, True):
+        del built[:]
+        cont = cls(config, compile=compile_)
+
+        renderer = cont.get('renderer', 'lazy')
+        assert built == []
+        assert isinstance(renderer.render, PDF)
+        assert renderer.render.render() == 'pdf'
+        assert built == ['pdf']
+
+        renderer = cont.get('renderer', 'provided')
+        assert built == ['pdf']
+        assert isinstance(renderer.render(), PDF)
+        assert built == ['pdf', 'pdf']
+
+    cont = cls(config).child({'renderer': {'lazy': {'render:render': 'pdf'}}})
+    del built[:]
+    cont.get('renderer', 'lazy')
+    assert built == ['pdf']
+
+    # lazy deps and providers of the child are resolved by the child
+    parent = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(lambda name: dict)})({
+            'dep': {'x': {'__realization__': 'x.X', '$name': 'parent'}},
+            'svc': {'h': {
+                '__realization__': 'x.H', '__providers__': ['p'],
+                'lazy:dep': '~x', 'p:dep': 'x'}},
+        })
+    parent.get('svc', 'h')
+    child = parent.child({'dep': {'x': {'$name': 'child'}}})
+    svc = child.get('svc', 'h')
+    assert svc['lazy'] == {'name': 'child'}
+    assert svc['p']() == {'name': 'child'}
+
+    # lazy deps are still the deps
+    assert Container.collect_errors({'x': {'y': {
+        '__realization__': 'x.Y', 'x': '~z'}}})
+
+
+def test_pooled_lifetime():
+    """Tests the "pooled" entities"""
+
+    class Parser(object):
+        closed = False
+
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+        def close(self):
+            self.closed = True
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({'Parser': Parser}.get)})
+    cont = cls({
+        'parser': {
+            'xml': {
+                '__realization__': 'Parser',
+                '__type__': 'pooled',
+                '__pool_size__': 2,
+                '$strict': True,
+            },
+        },
+    })
+    with cont.acquire('parser', 'xml') as p1:
+        with cont.acquire('parser', 'xml') as p2:
+            assert p1 is not p2
+            assert p1.kwargs == {'strict': True}
+    with cont.acquire('parser', 'xml') as p3:
+        assert p3 in (p1, p2)
+
+    # exhausted pool
+    results = []
+
+    def worker():
+        with cont.acquire('parser', 'xml') as p:
+            results.append(p)
+
+    with cont.acquire('parser', 'xml'):
+        with cont.acquire('parser', 'xml'):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            time.sleep(0.05)
+            assert results == []
+            try:
+                with cont.acquire('parser', 'xml', timeout=0.01):
+                    pass
+            except RuntimeError:
+                pass
+            else:
+                assert False, 'Pool must be exhausted'
+    thread.join()
+    assert results[0] in (p1, p2)
+
+    # broken instance is disposed
+    try:
+        with cont.acquire('parser', 'xml') as broken:
+            raise KeyError()
+    except KeyError:
+        pass
+    assert broken.closed
+
+    stats = cont.pool_stats()[('parser', 'xml')]
+    assert stats['creations'] == 2
+    assert stats['waits'] == 2
+    assert stats['hits'] == 5
+    assert stats['created'] == 1
+
+    try:
+        cont.get('parser', 'xml')
+    except ValueError:
+        pass
+    else:
+        assert False, 'Pooled entity must be acquired'
+
+    assert Container.collect_errors({'x': {'y': {
+        '__realization__': 'x.Y', '__type__': 'pooled',
+        '__pool_size__': 0}}})
+
+    # pooled entities can't be the deps
+    try:
+        cont.child({'parser': {'user': {
+            '__realization__': 'Parser', 'xml:parser': 'xml'}}})
+    except ValueError as e:
+        assert "'parser:user' depends on the pooled 'parser:xml'" in str(e)
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_close():
+    """Tests the ordered disposal of the singletones"""
+
+    closed = []
+
+    class Resource(object):
+        def __init__(self, name, delay=0, **deps):
+            self.name = name
+            self.delay = delay
+
+        def close(self):
+            time.sleep(self.delay)
+            closed.append(self.name)
+
+    class Manager(object):
+        def __init__(self, name):
+            self.name = name
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            closed.append(self.name)
+
+    cls = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(
+            {'Resource': Resource, 'Manager': Manager}.get)})
+    cont = cls({
+        'res': {
+            '__default__': {
+                '__realization__': 'Resource',
+                '__type__': 'singleton',
+            },
+            'db': {'$name': 'db', '$delay': 0.1},
+            'cache': {'$name': 'cache', '$delay': 0.1},
+            'hung': {'$name': 'hung', '$delay': 0.5},
+            'files': {'__realization__': 'Manager', '$name': 'files'},
+            'app': {
+                '$name': 'app',
+                'db:res': 'db', 'cache:res': 'cache', 'files:res': 'files'
+            },
+        }
+    })
+    app = cont.get('res', 'app')
+    cont.get('res', 'hung')
+    child = cont.child({'res': {'app': {'$name': 'app2'}}}, True)
+    child.get('res', 'app')
+
+    child.close()
+    assert closed == ['app2']
+
+    start = time.time()
+    try:
+        cont.close(timeout=0.3)
+    except RuntimeError as e:
+        assert 'res:hung' in str(e)
+    else:
+        assert False, 'Hung disposal must be reported'
+    # independent ones are disposed in parallel
+    assert time.time() - start < 0.5
+    assert closed[:2] == ['app2', 'app']
+    assert sorted(closed[2:]) == ['cache', 'db', 'files']
+
+    assert cont.get('res', 'app') is not app
+
+    # number of the threads is bounded, the hung one is replaced
+    running = []
+    peak = []
+
+    class Slow(object):
+        def __init__(self, delay):
+            self.delay = delay
+
+        def close(self):
+            running.append(self)
+            peak.append(len(running))
+            time.sleep(self.delay)
+            running.remove(self)
+
+    instances = dict(
+        (('res', str(i)), Slow(0.01)) for i in range(20))
+    instances[('res', 'hung')] = Slow(1)
+    start = time.time()
+    errors = dispose_parallel(instances, timeout=0.1, max_workers=2)
+    assert list(errors) == [('res', 'hung')]
+    assert max(peak) <= 3  # the hung one and two workers
+    assert time.time() - start < 0.5
+
+
+def test_dependency_queries():
+    """Tests the forward and reverse dependency queries"""
+
+    cont = Container({
+        'app': {'api': {
+            '__realization__': 'x.Api', 'db:res': 'db', 'log:res': 'log'}},
+        'res': {
+            '__default__': {'__realization__': 'x.Res'},
+            'db': {'conn:res': 'conn'},
+            'conn': {},
+            'log': {},
+        },
+    })
+    api, db, conn, log = (
+        ('app', 'api'), ('res', 'db'), ('res', 'conn'), ('res', 'log'))
+    assert cont.dependencies('app', 'api') == set([db, conn, log])
+    assert cont.dependencies('app', 'api', transitive=False) == set([db, log])
+    assert cont.dependencies('res', 'conn') == set()
+    assert cont.dependents('res', 'conn') == set([db, api])
+    assert cont.dependents('res', 'conn', transitive=False) == set([db])
+
+    cont.update({'res': {'log': {'conn:res': 'conn'}}})
+    assert cont.dependents('res', 'conn') == set([db, log, api])
+    assert cont.dependencies('app', 'api') == set([db, conn, log])
+
+    try:
+        cont.dependents('res', 'nothing')
+    except ValueError:
+        pass
+    else:
+        assert False, 'Unknown entity must be reported'
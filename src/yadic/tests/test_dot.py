@@ -0,0 +1,87 @@
+# coding: utf-8
+
+import json
+import sys
+from xml.dom.minidom import parseString
+
+from yadic.container import Container
+from yadic.dot import (
+    _main, dot, render_dot, render_graphml, render_json, walk)
+
+
+def make_container():
+    return Container({
+        'app': {'api': {
+            '__realization__': 'x.Api',
+            'db:res': 'db', 'cache:res': 'cache'}},
+        'res': {
+            '__default__': {'__realization__': 'x.Res'},
+            'db': {'conn:res': 'conn'},
+            'cache': {'conn:res': 'conn', 'conns:res': ['conn', 'conn']},
+            'conn': {},
+        },
+    })
+
+
+def test_walk():
+    """Tests the deduplication and the subgraph extraction"""
+    cont = make_container()
+    edges = [p for p in walk(cont) if p[0]]
+    assert len(edges) == len(set(edges)) == 4
+
+    pairs = set(walk(cont, roots=[('app', 'api')], depth=1))
+    assert pairs == set([
+        (None, ('app', 'api')),
+        (('app', 'api'), ('res', 'db')),
+        (('app', 'api'), ('res', 'cache')),
+    ])
+    pairs = set(walk(cont, include={'res': set(['db'])}))
+    assert pairs == set([
+        (None, ('res', 'db')),
+        (('res', 'db'), ('res', 'conn')),
+    ])
+    pairs = set(walk(cont, exclude={'res': set()}))
+    assert pairs == set([(None, ('app', 'api'))])
+
+
+def test_renderers():
+    """Tests the dot, JSON and GraphML outputs"""
+    cont = make_container()
+    pairs = list(walk(cont, roots=[('res', 'db')]))
+
+    text = dot(cont, {}, {})
+    assert text.startswith('digraph container {')
+    assert text.count('"res:cache" -> "res:conn";') == 1
+
+    lines = list(render_dot(pairs, clusters=True))
+    assert '\tsubgraph "cluster_res" {' in lines
+    assert '\t"res:db" -> "res:conn";' in lines
+
+    data = json.loads('\n'.join(render_json(pairs)))
+    assert data == {
+        'edges': [['res:db', 'res:conn']],
+        'nodes': [
+            {'id': 'res:db', 'group': 'res'},
+            {'id': 'res:conn', 'group': 'res'},
+        ],
+    }
+
+    doc = parseString('\n'.join(render_graphml(pairs)))
+    assert len(doc.getElementsByTagName('node')) == 2
+    edge, = doc.getElementsByTagName('edge')
+    assert edge.getAttribute('source') == 'res:db'
+
+
+def test_main_unknown_root(tmpdir, monkeypatch, capsys):
+    """Tests that the unknown root is reported as the usage error"""
+    path = tmpdir.join('config.json')
+    path.write(json.dumps({'app': {'api': {'__realization__': 'x.Api'}}}))
+    monkeypatch.setattr(
+        sys, 'argv', ['dot', '-r', 'app:nope', str(path)])
+    try:
+        _main()
+    except SystemExit as e:
+        assert e.code == 2
+    else:
+        assert False, 'SystemExit expected'
+    assert 'app:nope is not configured' in capsys.readouterr()[1]
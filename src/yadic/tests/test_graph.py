@@ -0,0 +1,63 @@
+# coding: utf-8
+
+from yadic import graph
+
+
+def test_build():
+    """Tests the building of the dependency graph"""
+    result = graph.build({
+        'grp': {
+            'a': {
+                '__realization__': 'x.A',
+                '$arg': 1,
+                'b': ('b', 'b'),
+                'cs': (None, (('c', 'x'), ('c', 'y'))),
+            }
+        }
+    })
+    assert list(result) == [('grp', 'a')]
+    # order of the deps follows the order of the blueprint items
+    assert sorted(result[('grp', 'a')]) == [
+        ('b', 'b'), ('c', 'x'), ('c', 'y')]
+
+
+def test_levels():
+    """Tests the splitting of the graph into levels"""
+    g = {
+        'a': ('b', 'c'),
+        'b': ('c',),
+        'c': (),
+        'd': ('c',),
+    }
+    assert [sorted(lvl) for lvl in graph.levels(g)] == [
+        ['c'], ['b', 'd'], ['a']]
+    assert [sorted(lvl) for lvl in graph.levels(g, ['b'])] == [
+        ['c'], ['b']]
+
+
+def test_cycles():
+    """Tests the detection of the cyclic dependencies"""
+    try:
+        graph.levels({
+            ('g', 'a'): (('g', 'b'),),
+            ('g', 'b'): (('g', 'c'),),
+            ('g', 'c'): (('g', 'a'),),
+        }, [('g', 'a')])
+    except ValueError as e:
+        assert str(e) == 'Cyclic dependency: g:a -> g:b -> g:c -> g:a'
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_unknown_and_closure():
+    """Tests the search for unknown deps and the closure"""
+    g = {'a': ('b',), 'b': ('x',), 'c': ('a',)}
+    assert graph.unknown(g) == [('b', 'x')]
+    assert graph.closure(g, ['a']) == set(['a', 'b', 'x'])
+    assert graph.closure(g, []) == set()
+
+
+def test_reverse():
+    """Tests the reversing of the graph"""
+    assert graph.reverse({'a': ('b', 'c'), 'b': ('c',), 'c': ()}) == {
+        'a': (), 'b': ('a',), 'c': ('a', 'b')}
@@ -0,0 +1,116 @@
+# coding: utf-8
+
+import time
+
+from yadic.container import Container, EntityConfiguringError
+from yadic.observe import Observer, MetricsCollector
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def on_resolve_start(self, key):
+        self.events.append(('start', key))
+
+    def on_resolve_end(self, key, instance):
+        self.events.append(('end', key))
+
+    def on_import(self, key, name, seconds):
+        self.events.append(('import', key, name))
+
+    def on_singleton_created(self, key, instance):
+        self.events.append(('singleton', key))
+
+    def on_error(self, key, exc):
+        self.events.append(('error', key, type(exc)))
+
+
+def make_container():
+    def slow(**kw):
+        time.sleep(0.01)
+        return kw
+
+    return type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod({
+            'Slow': slow,
+            'Fail': lambda: 1 / 0,
+            'X': 1,
+        }.get)
+    })({
+        'app': {
+            'api': {
+                '__realization__': 'Slow',
+                '__type__': 'singleton',
+                'db:res': 'db',
+                'x:res': 'x',
+            },
+            'broken': {'__realization__': 'Slow', 'fail:res': 'fail'},
+        },
+        'res': {
+            'db': {'__realization__': 'Slow'},
+            'x': {'__realization__': 'X', '__type__': 'static'},
+            'fail': {'__realization__': 'Fail'},
+        }
+    })
+
+
+def test_observer_hooks():
+    """Tests the sequence of the observer hooks"""
+    cont = make_container()
+    rec = Recorder()
+    cont.add_observer(rec)
+    cont.get('app', 'api')
+    cont.get('app', 'api')
+    assert rec.events == [
+        ('import', ('app', 'api'), 'Slow'),
+        ('start', ('app', 'api')),
+        ('import', ('res', 'db'), 'Slow'),
+        ('start', ('res', 'db')),
+        ('end', ('res', 'db')),
+        ('import', ('res', 'x'), 'X'),
+        ('end', ('app', 'api')),
+        ('singleton', ('app', 'api')),
+    ]
+
+    del rec.events[:]
+    try:
+        cont.get('app', 'broken')
+    except EntityConfiguringError:
+        pass
+    assert rec.events[-2:] == [
+        ('error', ('res', 'fail'), ZeroDivisionError),
+        ('error', ('app', 'broken'), ZeroDivisionError),
+    ]
+
+    cont.remove_observer(rec)
+    del rec.events[:]
+    cont.get('res', 'db')
+    assert not rec.events
+
+
+def test_metrics_collector():
+    """Tests the aggregation of the metrics"""
+    cont = make_container()
+    metrics = MetricsCollector()
+    cont.add_observer(metrics)
+    cont.get('app', 'api')
+    cont.get('res', 'db')
+    try:
+        cont.get('app', 'broken')
+    except EntityConfiguringError:
+        pass
+
+    stats = metrics.stats
+    assert sorted(stats) == [
+        'app:api', 'app:broken', 'res:db', 'res:fail', 'res:x']
+    assert stats['res:db']['calls'] == 2
+    assert stats['app:api']['calls'] == 1
+    assert stats['app:api']['cumulative'] >= 0.02
+    # api waits 0.01 itself and 0.01 for the db
+    assert 0.01 <= stats['app:api']['self_time']
+    assert stats['app:api']['self_time'] + 0.01 <= (
+        stats['app:api']['cumulative'])
+    assert stats['app:broken']['errors'] == 1
+    assert stats['res:x']['imports'] == 1
+    assert stats['res:x']['calls'] == 0
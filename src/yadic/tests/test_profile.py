@@ -0,0 +1,31 @@
+# coding: utf-8
+
+from yadic.container import Container
+from yadic.profile import profile
+
+
+def test_profile():
+    """Tests the collapsed stacks and the table of the profiler"""
+    cont = type('LocalContainer', (Container,), {
+        '_get_entity': staticmethod(lambda name: dict)
+    })({
+        'app': {'api': {'__realization__': 'x.Api', 'db:res': 'db'}},
+        'res': {'db': {'__realization__': 'x.Db'}},
+    })
+
+    profiler = profile(cont, 'app', 'api', number=3)
+    paths = [line.rsplit(' ', 1)[0] for line in profiler.collapsed()]
+    assert paths == [
+        'app:api',
+        'app:api [import x.Api]',
+        'app:api;res:db',
+        'app:api;res:db [import x.Db]',
+    ]
+    assert all(
+        line.rsplit(' ', 1)[1].isdigit() for line in profiler.collapsed())
+
+    table = profiler.table(top=1)
+    assert len(table) == 2
+    assert table[1].split()[0] in ('app:api', 'res:db')
+    assert profiler.stats['res:db']['calls'] == 3
+    assert not cont._observers
@@ -94,3 +94,26 @@ def test_merge_of_dicts_with_prefixed_keys():
         'b': 20,
         'c': 3
     }
+
+
+def test_freeze():
+    """Tests the fingerprints of the structures"""
+    assert freeze({'a': [1, {'b': 2}], 'c': 'd'}) == freeze(
+        {'c': 'd', 'a': [1, {'b': 2}]})
+    assert freeze({'a': [1]}) != freeze({'a': (1,)})
+    assert freeze({'a': 1}) != freeze({'a': True})
+    hash(freeze({'a': [1, {'b': 2}]}))
+    try:
+        freeze({'a': set()})
+    except TypeError:
+        pass
+    else:
+        assert False, 'TypeError expected'
+
+
+def test_merge_of_dicts_with_lazy_keys():
+    assert merge(
+        {'a': 1, '~b': 2, '$c': 3},
+        {'~a': 10, 'b': 20, '~c': 30},
+        lambda x, y, m, p: y
+    ) == {'~a': 10, 'b': 20, '~c': 30}
@@ -1,12 +1,14 @@
 # coding:utf-8
 """Utilties"""
 
+import multiprocessing
+
 
 def merge(d1, d2, fn, path=tuple()):
     """
     Updates the dict "d1" with elems of the dict "d2",
     and returns the dict "d1".
-    Keys like 'a' and '$a' will be considered equal!
+    Keys like 'a', '$a' and '~a' will be considered equal!
     Collisions will be resolved using the function "fn",
     which takes:
     - both of values
@@ -18,12 +20,12 @@ def merge(d1, d2, fn, path=tuple()):
         raise TypeError("Only dicts can be merged!")
     for k, v in d2.items():
         try:
-            if k.startswith('$'):
-                variants = (k, k[1:])
-            else:
-                variants = ('$' + k, k)
+            base = k[1:] if k.startswith(('$', '~')) else k
         except AttributeError:
             variants = (k,)
+        else:
+            variants = (k,) + tuple(
+                p + base for p in ('', '$', '~') if p + base != k)
         for key in variants:
             try:
                 old_v = d1.pop(key)
@@ -49,3 +51,28 @@ def deep_merge(d1, d2, fn):
         return g(x, y, m, p)
 
     return merge(d1, d2, merger)
+
+
+def freeze(obj):
+    """
+    Returns the hashable "fingerprint" of the structure of dicts/lists.
+    Fingerprints of the equal structures are equal
+    (the types of the values are taken into account too).
+    Raises the TypeError for the unhashable values.
+    """
+    if isinstance(obj, dict):
+        return (dict, frozenset((k, freeze(v)) for k, v in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return (type(obj), tuple(freeze(v) for v in obj))
+    hash(obj)
+    return (type(obj), obj)
+
+
+def default_workers():
+    """Returns the default number of the worker threads
+    (the same as the ThreadPoolExecutor of Python 3.8+ uses)"""
+    try:
+        cpus = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpus = 1
+    return min(32, cpus + 4)